@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Shared helpers for the HEIC/HEIF converters (heic_to_svg, heic_to_tiff, heic_to_webp, heif_to_jpg)
+Sets up logging, registers the HEIF opener, opens/decodes HEIF input and runs manifest batches across a process pool
+"""
+
+import os
+import sys
+import json
+import logging
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from PIL import Image
+    HAS_PIL = True
+except ImportError:
+    HAS_PIL = False
+
+try:
+    from pillow_heif import register_heif_opener, open_heif, set_orientation, options as heif_options
+    HAS_PILLOW_HEIF = True
+except ImportError:
+    HAS_PILLOW_HEIF = False
+
+try:
+    import numpy as np
+    HAS_NUMPY = True
+except ImportError:
+    HAS_NUMPY = False
+
+
+logger = logging.getLogger("heic_common")
+
+
+def setup_logging(verbose=False, quiet=False):
+    """
+    Progress messages (INFO) go to stdout, warnings and errors to stderr.
+    verbose adds tracebacks to errors; quiet keeps only warnings and errors.
+    """
+    stdout_handler = logging.StreamHandler(sys.stdout)
+    stdout_handler.addFilter(lambda record: record.levelno < logging.WARNING)
+    stderr_handler = logging.StreamHandler(sys.stderr)
+    stderr_handler.setLevel(logging.WARNING)
+    level = logging.DEBUG if verbose else logging.WARNING if quiet else logging.INFO
+    logging.basicConfig(level=level, format="%(message)s", handlers=[stdout_handler, stderr_handler])
+
+
+def add_logging_args(parser):
+    """Add the -v/--verbose and -q/--quiet options read by setup_logging()"""
+    parser.add_argument("-v", "--verbose", action="store_true", help="Include tracebacks with error messages")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only log warnings and errors")
+
+
+_HEIF_REGISTERED = False
+
+
+def ensure_heif():
+    """Register HEIF opener once per process"""
+    global _HEIF_REGISTERED
+    if HAS_PILLOW_HEIF and not _HEIF_REGISTERED:
+        register_heif_opener()
+        _HEIF_REGISTERED = True
+    elif not HAS_PILLOW_HEIF:
+        raise ImportError("pillow-heif is not installed. Please install it with: pip install pillow-heif")
+
+
+def set_decode_threads(threads: int):
+    """
+    Set how many threads libheif uses to decode the tiles of one image
+    (iPhone HEICs are grids of independently decodable 512x512 tiles)
+    """
+    if HAS_PILLOW_HEIF:
+        heif_options.DECODE_THREADS = max(1, threads)
+
+
+def decode_heif(heic_file):
+    """
+    Decode the primary HEIF image into Pillow through a NumPy view of pillow-heif's
+    pixel buffer, so no intermediate bytes copy of the full frame is made (RGBA is
+    shared outright). Falls back to Image.open() if anything goes wrong.
+    libheif has already applied the HEIF rotation/mirroring to the pixels, so the EXIF/XMP
+    orientation is reset to 1 (as the Image.open() plugin does); otherwise exif_transpose()
+    would rotate the image a second time.
+    """
+    if HAS_PILLOW_HEIF and HAS_NUMPY:
+        try:
+            heif = open_heif(heic_file, convert_hdr_to_8bit=True)
+            set_orientation(heif.info)
+            img = Image.fromarray(np.asarray(heif))
+            for key in ("exif", "icc_profile", "xmp"):
+                if heif.info.get(key):
+                    img.info[key] = heif.info[key]
+            return img
+        except Exception as e:
+            logger.warning(f"Warning: NumPy HEIF decode failed, falling back to Image.open: {e}")
+    return Image.open(heic_file)
+
+
+def open_heic(heic_file, max_dimension, decode=False):
+    """
+    Open a HEIC file, preferring an embedded thumbnail that still covers max_dimension.
+    Image.open() is lazy, so picking a thumbnail here skips decoding the full-resolution frame.
+    With decode=True, HEIF input without a usable thumbnail is decoded through decode_heif().
+    """
+    img = Image.open(heic_file)
+    if HAS_PILLOW_HEIF and max(img.size) > max_dimension:
+        boxes = img.info.get("thumbnails") or []
+        fitting = [i for i, box in enumerate(boxes) if box >= max_dimension]
+        if fitting:
+            heif = open_heif(heic_file)
+            thumb = heif[heif.primary_index].get_thumbnail(min(fitting, key=boxes.__getitem__)).to_pillow()
+            logger.info(f"Using embedded thumbnail {thumb.size} instead of full decode {img.size}")
+            img.close()
+            return thumb
+    if not decode or img.format != "HEIF":
+        return img
+    img.close()
+    return decode_heif(heic_file)
+
+
+def read_manifest(manifest_file: str) -> list:
+    """
+    Read (input, output) pairs from a batch manifest: either JSON (a list of
+    {"input": ..., "output": ...} objects or [input, output] pairs) or a text
+    file with one "input<TAB>output" pair per line (blank lines are skipped).
+
+    Raises:
+        ValueError: naming the line (or JSON entry) number of the first malformed entry
+    """
+    with open(manifest_file, 'r', encoding='utf-8') as f:
+        content = f.read()
+
+    pairs = []
+    if not manifest_file.endswith('.json'):
+        for line_number, line in enumerate(content.splitlines(), 1):
+            if not line.strip():
+                continue
+            fields = line.split('\t')
+            if len(fields) != 2 or not all(fields):
+                raise ValueError(f"{manifest_file}: line {line_number}: expected 'input<TAB>output', got {line!r}")
+            pairs.append((fields[0], fields[1]))
+        return pairs
+
+    entries = json.loads(content)
+    if not isinstance(entries, list):
+        raise ValueError(f"{manifest_file}: expected a JSON list of input/output pairs")
+    for entry_number, entry in enumerate(entries, 1):
+        if isinstance(entry, dict):
+            pair = (entry.get("input"), entry.get("output"))
+        elif isinstance(entry, list) and len(entry) == 2:
+            pair = tuple(entry)
+        else:
+            pair = (None, None)
+        if not all(isinstance(path, str) and path for path in pair):
+            raise ValueError(f"{manifest_file}: entry {entry_number}: expected {{\"input\": ..., \"output\": ...}} or [input, output], got {entry!r}")
+        pairs.append(pair)
+    return pairs
+
+
+def _init_batch_worker(decode_threads):
+    """Pool initializer: HEIF opener plus this worker's share of the decode threads"""
+    if HAS_PILLOW_HEIF:
+        ensure_heif()
+    set_decode_threads(decode_threads)
+
+
+def _batch_worker(job):
+    """Run one manifest entry inside a pool worker"""
+    convert, input_file, output_file, options = job
+    return convert(input_file, output_file, **options)
+
+
+def convert_many(convert, pairs, workers=None, **options) -> int:
+    """
+    Run convert(input, output, **options) for every (input, output) pair in parallel
+    across a process pool. convert must be a module-level function so it can be sent
+    to the workers. The cores are split between the workers so tile decoding inside
+    each one does not oversubscribe the CPU.
+
+    Returns:
+        Number of failed conversions
+    """
+    jobs = [(convert, input_file, output_file, options) for input_file, output_file in pairs]
+    workers = workers or os.cpu_count()
+    decode_threads = (os.cpu_count() or 1) // workers
+
+    logger.info(f"Batch: {len(jobs)} file(s) across {workers} worker(s)")
+    # chunksize=1: every job is an expensive decode + encode, so hand them out one at a time
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_batch_worker, initargs=(decode_threads,)) as pool:
+        results = list(pool.map(_batch_worker, jobs, chunksize=1))
+
+    failed = results.count(False)
+    logger.info(f"Batch finished: {len(jobs) - failed} succeeded, {failed} failed")
+    return failed
+
+
+def convert_batch(convert, manifest_file: str, workers=None, **options) -> int:
+    """Run convert over every pair listed in a manifest file (see read_manifest) in parallel"""
+    return convert_many(convert, read_manifest(manifest_file), workers=workers, **options)
@@ -11,36 +11,132 @@ HEIC → WebP converter (backend-ready)
 
 import os
 import sys
+import io
 import argparse
-import traceback
+import logging
+from typing import Optional
+import json
 
 try:
+    import PIL
     from PIL import Image, ImageOps
     HAS_PIL = True
+    # Pillow-SIMD is a drop-in fork (SSE4/AVX2 resize, convert and codecs)
+    # versioned as X.Y.Z.postN; the code paths are identical either way
+    HAS_PILLOW_SIMD = '.post' in PIL.__version__
 except ImportError:
     HAS_PIL = False
+    HAS_PILLOW_SIMD = False
 
 try:
-    from pillow_heif import register_heif_opener
+    from pillow_heif import open_heif
     HAS_PILLOW_HEIF = True
 except ImportError:
     HAS_PILLOW_HEIF = False
 
+from heic_common import setup_logging, add_logging_args, ensure_heif, set_decode_threads, open_heic, convert_many as run_many, read_manifest
 
-_HEIF_REGISTERED = False
+# Register the HEIF opener once at import; pool workers inherit it on fork
+if HAS_PILLOW_HEIF:
+    ensure_heif()
 
+# Half the cores by default, leaving headroom for the encode and other processes
+set_decode_threads((os.cpu_count() or 2) // 2)
 
-def _ensure_heif():
-    """Register HEIF opener once per process"""
-    global _HEIF_REGISTERED
-    if HAS_PILLOW_HEIF and not _HEIF_REGISTERED:
-        register_heif_opener()
-        _HEIF_REGISTERED = True
-    elif not HAS_PILLOW_HEIF:
+
+logger = logging.getLogger("heic_to_webp")
+
+
+def probe_heic(heic_file: str, max_dimension: int = 4096) -> dict:
+    """
+    Read the primary image's dimensions from the HEIF container (ispe box) without
+    decoding any pixel data, e.g. to check eligibility before a full conversion.
+    Sizes are as stored, before any EXIF rotation.
+    """
+    heif = open_heif(heic_file)
+    width, height = heif.size
+    return {
+        "width": width,
+        "height": height,
+        "mode": heif.mode,
+        "has_alpha": heif.has_alpha,
+        "needs_resize": max(width, height) > max_dimension,
+    }
+
+
+# WebP method when none is given: ~95% of method 6's compression at under half the CPU.
+# Method 0 trades a few % of size for speed and is only used when asked for (--method 0);
+# method 6 is only worth it for archival output.
+DEFAULT_METHOD = 4
+
+
+def encode_heic_to_webp_bytes(heic_file: str, quality: int = 90, lossless: bool = False, max_dimension: int = 4096, method: Optional[int] = None, alpha_quality: int = 100, fast: bool = False) -> bytes:
+    """
+    Convert HEIC/HEIF image to WebP and return the encoded bytes, so API code can
+    send the result without a round trip through the filesystem.
+    Takes the same options as convert_heic_to_webp(); raises on failure.
+    """
+    if not HAS_PILLOW_HEIF:
         raise ImportError("pillow-heif is not installed. Please install it with: pip install pillow-heif")
 
+    # Validate quality range
+    quality = max(0, min(100, quality))
+    
+    # Validate method range
+    if method is not None:
+        method = max(0, min(6, method))
 
-def convert_heic_to_webp(heic_file: str, output_file: str, quality: int = 90, lossless: bool = False, max_dimension: int = 4096, method: int = 6) -> bool:
+    if fast:
+        if method is None:
+            method = 3
+        quality = min(quality, 85)
+        alpha_quality = min(alpha_quality, 80)
+
+    img = open_heic(heic_file, max_dimension, decode=True)
+    logger.info(f"Opened image. Format={img.format}, Mode={img.mode}, Size={img.size}")
+    # Carried through to the WebP so colours render as in the source (no conversion cost)
+    icc_profile = img.info.get("icc_profile")
+
+    # Fix EXIF orientation. exif_transpose() returns a full copy even when there is
+    # nothing to do, so only call it for a non-identity orientation (pillow-heif
+    # already applies the HEIF transforms and resets the tag to 1)
+    orientation = img.getexif().get(0x0112, 1)
+    if orientation != 1:
+        img = ImageOps.exif_transpose(img)
+        logger.info(f"After EXIF transpose (orientation {orientation}): Size={img.size}")
+
+    # Ensure webp-compatible mode
+    # (done before resizing so the resample runs on the final bands only)
+    if img.mode not in ("RGB", "RGBA"):
+        has_alpha = 'A' in img.mode or 'transparency' in img.info
+        img = img.convert("RGBA" if has_alpha else "RGB")
+
+    # Downscale if needed. thumbnail() works in place, is a no-op when the image
+    # already fits, and with reducing_gap=3.0 does a fast integer reduce() to within
+    # 3x of the target first, which makes LANCZOS cheap enough to always use
+    original_size = img.size
+    img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=3.0)
+    if img.size != original_size:
+        logger.info(f"Resized to {img.size[0]}x{img.size[1]}")
+
+    # Encode as WebP
+    if method is None:
+        method = DEFAULT_METHOD
+    # exact=False: RGB under fully transparent pixels may be altered (smaller, faster)
+    save_kwargs = {"format": "WEBP", "method": method, "exact": False}
+    if lossless:
+        save_kwargs.update({"lossless": True, "quality": 100})
+    else:
+        save_kwargs.update({"quality": quality, "alpha_quality": max(0, min(100, alpha_quality))})
+    if icc_profile:
+        save_kwargs["icc_profile"] = icc_profile
+
+    buf = io.BytesIO()
+    img.save(buf, **save_kwargs)
+    return buf.getvalue()
+
+
+def convert_heic_to_webp(heic_file: str, output_file: str, quality: int = 90, lossless: bool = False, max_dimension: int = 4096, method: Optional[int] = None, alpha_quality: int = 100, fast: bool = False) -> bool:
     """
     Convert HEIC/HEIF image to WebP format.
     
@@ -50,93 +146,77 @@ def convert_heic_to_webp(heic_file: str, output_file: str, quality: int = 90, lo
         quality: WebP quality (0-100), ignored if lossless=True
         lossless: Use lossless WebP compression
         max_dimension: Maximum width or height (will downscale if exceeded)
-        method: WebP encoding method (0-6, higher = better compression but slower)
+        method: WebP encoding method (0-6, higher = better compression but slower);
+                None uses DEFAULT_METHOD (4)
+        alpha_quality: Quality of the alpha plane (0-100) for lossy output
+        fast: Speed preset for transient output: method 3 (unless given),
+              quality capped at 85 and alpha_quality at 80
     
     Returns:
         True if conversion successful, False otherwise
     """
-    print("Starting HEIC to WebP conversion")
-    print(f"Input: {heic_file}")
-    print(f"Output: {output_file}")
-    print(f"Quality: {quality}")
-    print(f"Lossless: {lossless}")
-    print(f"Max dimension: {max_dimension}")
-    print(f"Method: {method}")
+    logger.info("Starting HEIC to WebP conversion")
+    logger.info(f"Input: {heic_file}")
+    logger.info(f"Output: {output_file}")
+    logger.info(f"Quality: {quality}")
+    logger.info(f"Lossless: {lossless}")
+    logger.info(f"Max dimension: {max_dimension}")
+    logger.info(f"Method: {method}")
+    logger.info(f"Fast: {fast}")
 
     if not HAS_PIL:
-        print("ERROR: Pillow not available. Please install with: pip install Pillow", file=sys.stderr)
+        logger.error("ERROR: Pillow not available. Please install with: pip install Pillow")
         return False
 
-    if not os.path.exists(heic_file):
-        print(f"ERROR: File not found: {heic_file}", file=sys.stderr)
+    try:
+        src_size = os.stat(heic_file).st_size
+    except FileNotFoundError:
+        logger.error(f"ERROR: File not found: {heic_file}")
         return False
+    logger.info(f"Input size: {src_size} bytes")
 
     try:
-        _ensure_heif()
-
-        # Validate quality range
-        quality = max(0, min(100, quality))
-        
-        # Validate method range
-        method = max(0, min(6, method))
-
-        img = Image.open(heic_file)
-        print(f"Opened image. Format={img.format}, Mode={img.mode}, Size={img.size}")
-        
-        # Fix EXIF orientation
-        img = ImageOps.exif_transpose(img)
-        print(f"After EXIF transpose: Size={img.size}")
-
-        # Downscale if needed
-        w, h = img.size
-        if max(w, h) > max_dimension:
-            scale = max_dimension / max(w, h)
-            new_w = int(w * scale)
-            new_h = int(h * scale)
-            # Use LANCZOS for larger downscales, BILINEAR for smaller
-            resample = Image.Resampling.LANCZOS if scale < 0.5 else Image.Resampling.BILINEAR
-            img = img.resize((new_w, new_h), resample)
-            print(f"Resized to {new_w}x{new_h}")
-
-        # Ensure webp-compatible mode
-        if img.mode not in ("RGB", "RGBA"):
-            img = img.convert("RGBA" if ('transparency' in img.info or img.mode in ("LA",)) else "RGB")
+        data = encode_heic_to_webp_bytes(heic_file, quality=quality, lossless=lossless, max_dimension=max_dimension,
+                                         method=method, alpha_quality=alpha_quality, fast=fast)
+        if not data:
+            logger.error(f"ERROR: Encoded WebP is empty for: {heic_file}")
+            return False
 
         # Ensure output directory exists
         out_dir = os.path.dirname(output_file)
-        if out_dir and not os.path.exists(out_dir):
+        if out_dir:
             os.makedirs(out_dir, exist_ok=True)
 
-        # Save as WebP
-        save_kwargs = {"format": "WEBP", "method": method}
-        if lossless:
-            save_kwargs.update({"lossless": True, "quality": 100})
-        else:
-            save_kwargs.update({"quality": quality})
-
-        img.save(output_file, **save_kwargs)
-
-        # Verify output file was created and has content
-        if not os.path.exists(output_file):
-            print(f"ERROR: Output file was not created: {output_file}", file=sys.stderr)
-            return False
-        
-        if os.path.getsize(output_file) == 0:
-            print(f"ERROR: Output file is empty: {output_file}", file=sys.stderr)
-            return False
+        # The whole encoded file goes out in a single write()
+        with open(output_file, 'wb') as fh:
+            fh.write(data)
 
-        print("WebP created successfully")
+        logger.info(f"WebP created successfully ({len(data)} bytes)")
         return True
 
     except ImportError as e:
-        print(f"ERROR: Missing dependency: {e}", file=sys.stderr)
+        logger.error(f"ERROR: Missing dependency: {e}")
         return False
     except Exception as e:
-        print(f"ERROR: HEIC → WebP conversion failed: {e}", file=sys.stderr)
-        traceback.print_exc()
+        logger.error(f"ERROR: HEIC → WebP conversion failed: {e}", exc_info=logger.isEnabledFor(logging.DEBUG))
         return False
 
 
+def convert_many(pairs, workers: Optional[int] = None, **options) -> int:
+    """
+    Convert (input, output) pairs in parallel across a process pool (see heic_common.convert_many)
+    
+    Returns:
+        Number of failed conversions
+    """
+    return run_many(convert_heic_to_webp, pairs, workers=workers, **options)
+
+
+def convert_batch(manifest_file: str, workers: Optional[int] = None, **options) -> int:
+    """Convert every pair listed in a manifest file (see heic_common.read_manifest) in parallel"""
+    return convert_many(read_manifest(manifest_file), workers=workers, **options)
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="Convert HEIC/HEIF images to WebP format",
@@ -147,10 +227,11 @@ Examples:
   %(prog)s input.heic output.webp --quality 90
   %(prog)s input.heic output.webp --max-dimension 2048 --lossless
   %(prog)s input.heic output.webp --quality 90 --method 6
+  %(prog)s input.heic --probe
         """
     )
-    parser.add_argument("heic_file", help="Input HEIC/HEIF file path")
-    parser.add_argument("output_file", help="Output WebP file path")
+    parser.add_argument("heic_file", nargs="?", help="Input HEIC/HEIF file path")
+    parser.add_argument("output_file", nargs="?", help="Output WebP file path")
     parser.add_argument(
         "--quality",
         type=int,
@@ -171,26 +252,81 @@ Examples:
     parser.add_argument(
         "--method",
         type=int,
-        default=6,
+        default=None,
         choices=range(0, 7),
         metavar="[0-6]",
-        help="WebP encoding method (0-6, default: 6). Higher values provide better compression but are slower."
+        help="WebP encoding method (0-6, default: 4). Higher values compress better but are slower; 6 is only worth it for archival output."
+    )
+    parser.add_argument(
+        "--alpha-quality",
+        type=int,
+        default=100,
+        help="Quality of the alpha plane for lossy output (0-100, default: 100)"
+    )
+    parser.add_argument(
+        "--fast",
+        action="store_true",
+        help="Speed preset for transient output: method 3, quality <= 85, alpha quality <= 80"
+    )
+    parser.add_argument(
+        "--probe",
+        action="store_true",
+        help="Print the input's dimensions as JSON (read from the container, no decode) and exit"
+    )
+    parser.add_argument(
+        "--batch",
+        metavar="MANIFEST",
+        help="Manifest of input/output pairs to convert in parallel: JSON, or text with one 'input<TAB>output' per line"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Worker processes for --batch (default: one per CPU)"
     )
+    add_logging_args(parser)
     args = parser.parse_args()
-
-    print("=== HEIC to WebP Converter ===")
-    print(f"Python: {sys.version}")
-    print(f"Args: {vars(args)}")
-
-    ok = convert_heic_to_webp(
-        args.heic_file,
-        args.output_file,
-        args.quality,
-        args.lossless,
-        args.max_dimension,
-        args.method
+    if args.probe:
+        if not args.heic_file:
+            parser.error("heic_file is required with --probe")
+        if not HAS_PILLOW_HEIF:
+            print("ERROR: pillow-heif is not installed", file=sys.stderr)
+            sys.exit(1)
+        try:
+            print(json.dumps(probe_heic(args.heic_file, args.max_dimension)))
+        except Exception as e:
+            print(f"ERROR: Could not probe {args.heic_file}: {e}", file=sys.stderr)
+            sys.exit(1)
+        sys.exit(0)
+    if not args.batch and not (args.heic_file and args.output_file):
+        parser.error("heic_file and output_file are required unless --batch is given")
+
+    setup_logging(verbose=args.verbose, quiet=args.quiet)
+
+    logger.info("=== HEIC to WebP Converter ===")
+    logger.info(f"Python: {sys.version}")
+    logger.info(f"Args: {vars(args)}")
+    if HAS_PIL:
+        logger.info(f"Pillow: {PIL.__version__} (SIMD: {HAS_PILLOW_SIMD})")
+
+    options = dict(
+        quality=args.quality,
+        lossless=args.lossless,
+        max_dimension=args.max_dimension,
+        method=args.method,
+        alpha_quality=args.alpha_quality,
+        fast=args.fast
     )
 
+    if args.batch:
+        try:
+            ok = convert_batch(args.batch, workers=args.workers, **options) == 0
+        except ValueError as e:
+            logger.error(f"ERROR: Invalid manifest: {e}")
+            ok = False
+    else:
+        ok = convert_heic_to_webp(args.heic_file, args.output_file, **options)
+
     sys.exit(0 if ok else 1)
 
 
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Resident HEIC conversion worker
+Imports Pillow + pillow-heif and registers the HEIF opener once, then serves
+conversions over stdin/stdout so the interpreter and codec startup is paid once
+instead of once per file.
+
+Protocol (one JSON object per line):
+  request:  {"id": 1, "format": "svg"|"tiff"|"webp", "input": "in.heic", "output": "out.svg", "opts": {...}}
+  response: {"id": 1, "ok": true} or {"id": 1, "ok": false, "error": "..."}
+
+"opts" are passed as keyword arguments to the matching convert_heic_to_* function.
+Converter log output goes to stderr so stdout carries only responses.
+HEIC_DECODE_THREADS sets libheif decode threads per worker, so a pool of
+workers does not oversubscribe the CPUs.
+"""
+
+import os
+import sys
+import json
+import logging
+import contextlib
+import traceback
+
+import heic_common
+import heic_to_svg
+import heic_to_tiff
+import heic_to_webp
+
+CONVERTERS = {
+    "svg": heic_to_svg.convert_heic_to_svg,
+    "tiff": heic_to_tiff.convert_heic_to_tiff,
+    "webp": heic_to_webp.convert_heic_to_webp,
+}
+
+
+def handle_request(request):
+    """Run a single conversion request and return the response dict"""
+    converter = CONVERTERS.get(request.get("format"))
+    if converter is None:
+        return {"ok": False, "error": f"Unsupported format: {request.get('format')}"}
+
+    with contextlib.redirect_stdout(sys.stderr):
+        ok = converter(request["input"], request["output"], **request.get("opts", {}))
+
+    if not ok:
+        return {"ok": False, "error": "Conversion failed"}
+    return {"ok": True}
+
+
+def main():
+    out = sys.stdout
+    # Converters log through the logging module; keep everything on stderr
+    logging.basicConfig(level=logging.INFO, format="%(message)s", stream=sys.stderr)
+
+    # Warm up: register the HEIF opener once for all converters
+    try:
+        heic_common.ensure_heif()
+    except ImportError as e:
+        print(f"Warning: {e}", file=sys.stderr)
+
+    decode_threads = os.environ.get("HEIC_DECODE_THREADS")
+    if decode_threads:
+        heic_common.set_decode_threads(int(decode_threads))
+
+    print("HEIC worker ready", file=sys.stderr, flush=True)
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError("expected a JSON object")
+        except ValueError as e:
+            response = {"id": None, "ok": False, "error": f"Invalid request: {e}"}
+        else:
+            try:
+                response = handle_request(request)
+            except Exception as e:
+                print(f"ERROR: HEIC worker request failed: {e}", file=sys.stderr)
+                traceback.print_exc()
+                response = {"ok": False, "error": str(e)}
+            response["id"] = request.get("id")
+
+        out.write(json.dumps(response) + "\n")
+        out.flush()
+
+
+if __name__ == '__main__':
+    main()
@@ -7,7 +7,7 @@ import sharp from "sharp";
 import { promises as fs } from "fs";
 import path from "path";
 import os from "os";
-import { execFile, spawn } from "child_process";
+import { ChildProcess, execFile, spawn } from "child_process";
 import { promisify } from "util";
 import { randomUUID } from "crypto";
 import Papa from "papaparse";
@@ -62,6 +62,199 @@ const scheduleBatchFileCleanup = (storedFilename: string) => {
 
 const execFileAsync = promisify(execFile);
 
+// Resident HEIC conversion workers (scripts/heic_worker.py). Each keeps a
+// Python process with Pillow + pillow-heif loaded so conversions skip the
+// interpreter and codec startup. A worker runs one job at a time: jobs wait in
+// a shared queue, and a job's timeout only starts once a worker picks it up.
+type HeicWorkerFormat = "svg" | "tiff" | "webp";
+type HeicWorkerResult = { ok: boolean; error?: string; stderr: string };
+type HeicWorkerJob = {
+  id: number;
+  format: HeicWorkerFormat;
+  input: string;
+  output: string;
+  opts: Record<string, unknown>;
+  timeoutMs: number;
+  resolve: (result: HeicWorkerResult) => void;
+};
+type HeicWorker = {
+  process: ChildProcess;
+  job: HeicWorkerJob | null;
+  stderr: string;
+  timer: NodeJS.Timeout | null;
+  // One-off worker for an overflow job; exits after it
+  oneShot: boolean;
+  exited: boolean;
+};
+
+// One worker per CPU (each decodes single-threaded, see HEIC_DECODE_THREADS)
+const HEIC_WORKER_POOL_SIZE = Math.max(
+  1,
+  parseInt(process.env.HEIC_WORKERS || "") || os.cpus().length
+);
+// With this many jobs already waiting, a request gets its own one-off worker
+// instead of queueing behind them
+const HEIC_WORKER_MAX_QUEUE = HEIC_WORKER_POOL_SIZE * 2;
+
+const heicWorkers: HeicWorker[] = [];
+const heicWorkerQueue: HeicWorkerJob[] = [];
+let heicWorkerNextId = 1;
+
+const finishHeicWorkerJob = (
+  worker: HeicWorker,
+  result: { ok: boolean; error?: string }
+) => {
+  const job = worker.job;
+  if (!job) return;
+  if (worker.timer) clearTimeout(worker.timer);
+  worker.timer = null;
+  worker.job = null;
+  job.resolve({ ...result, stderr: worker.stderr });
+  worker.stderr = "";
+  if (worker.oneShot) {
+    worker.process.stdin!.end();
+  } else {
+    dispatchHeicWorkerJobs();
+  }
+};
+
+const spawnHeicWorker = (oneShot: boolean): HeicWorker => {
+  const workerPath = path.join(__dirname, "..", "scripts", "heic_worker.py");
+  const decodeThreads = Math.max(
+    1,
+    Math.floor(os.cpus().length / HEIC_WORKER_POOL_SIZE)
+  );
+  const child = spawn("/opt/venv/bin/python", [workerPath], {
+    env: { ...process.env, HEIC_DECODE_THREADS: String(decodeThreads) },
+  });
+  const worker: HeicWorker = {
+    process: child,
+    job: null,
+    stderr: "",
+    timer: null,
+    oneShot,
+    exited: false,
+  };
+  let buffered = "";
+
+  // Writing to a worker that was just killed raises EPIPE; "exit" handles it
+  child.stdin!.on("error", (error: Error) => {
+    console.error("HEIC worker: stdin error:", error.message);
+  });
+
+  child.stdout!.on("data", (data: Buffer) => {
+    buffered += data.toString();
+    let newline = buffered.indexOf("\n");
+    while (newline !== -1) {
+      const line = buffered.slice(0, newline).trim();
+      buffered = buffered.slice(newline + 1);
+      newline = buffered.indexOf("\n");
+      if (!line) continue;
+      try {
+        const message = JSON.parse(line);
+        if (worker.job && message.id === worker.job.id) {
+          finishHeicWorkerJob(worker, {
+            ok: Boolean(message.ok),
+            error: message.error,
+          });
+        }
+      } catch {
+        console.error("HEIC worker: Unexpected output:", line);
+      }
+    }
+  });
+
+  child.stderr!.on("data", (data: Buffer) => {
+    worker.stderr += data.toString();
+    console.log("HEIC worker stderr:", data.toString());
+  });
+
+  // "error" (failed to spawn) and "exit" can both fire; handle the first
+  const onGone = (error: string) => {
+    if (worker.exited) return;
+    worker.exited = true;
+    const index = heicWorkers.indexOf(worker);
+    if (index !== -1) heicWorkers.splice(index, 1);
+    // Only the job this worker was running fails; queued jobs go to the
+    // remaining workers or a replacement
+    finishHeicWorkerJob(worker, { ok: false, error });
+    dispatchHeicWorkerJobs();
+  };
+
+  child.on("error", (error: Error) => {
+    console.error("HEIC worker: Failed to start Python process:", error);
+    onGone(`Failed to start HEIC worker: ${error.message}`);
+  });
+
+  child.on("exit", (code: number | null) => {
+    console.log("HEIC worker exited with code:", code);
+    onGone(`HEIC worker exited with code ${code}`);
+  });
+
+  return worker;
+};
+
+const startHeicWorkerJob = (worker: HeicWorker, job: HeicWorkerJob) => {
+  worker.job = job;
+  worker.stderr = "";
+  worker.timer = setTimeout(() => {
+    console.error(`HEIC worker: Job ${job.id} timed out, killing its worker`);
+    // The worker is stuck on this job; the exit handler fails just this job
+    worker.process.kill();
+  }, job.timeoutMs);
+  worker.process.stdin!.write(
+    JSON.stringify({
+      id: job.id,
+      format: job.format,
+      input: job.input,
+      output: job.output,
+      opts: job.opts,
+    }) + "\n"
+  );
+};
+
+// Hand queued jobs to idle workers, starting workers up to the pool size
+function dispatchHeicWorkerJobs() {
+  while (heicWorkerQueue.length > 0) {
+    let worker = heicWorkers.find((w) => !w.job && !w.exited);
+    if (!worker) {
+      if (heicWorkers.length >= HEIC_WORKER_POOL_SIZE) return;
+      worker = spawnHeicWorker(false);
+      heicWorkers.push(worker);
+    }
+    startHeicWorkerJob(worker, heicWorkerQueue.shift()!);
+  }
+}
+
+const runHeicWorkerJob = (
+  format: HeicWorkerFormat,
+  input: string,
+  output: string,
+  opts: Record<string, unknown>,
+  timeoutMs = 5 * 60 * 1000
+): Promise<HeicWorkerResult> => {
+  return new Promise((resolve) => {
+    const job: HeicWorkerJob = {
+      id: heicWorkerNextId++,
+      format,
+      input,
+      output,
+      opts,
+      timeoutMs,
+      resolve,
+    };
+    if (heicWorkerQueue.length >= HEIC_WORKER_MAX_QUEUE) {
+      console.log(
+        `HEIC worker: ${heicWorkerQueue.length} jobs queued, running job ${job.id} in a one-off worker`
+      );
+      startHeicWorkerJob(spawnHeicWorker(true), job);
+      return;
+    }
+    heicWorkerQueue.push(job);
+    dispatchHeicWorkerJobs();
+  });
+};
+
 // Configure multer for document file uploads (DOCX, RTF, ODT, TXT, etc.)
 const uploadDocument = multer({
   storage: multer.memoryStorage(),
@@ -27327,77 +27520,43 @@ app.post(
       // Use 4096 as default max dimension for faster conversion (can be adjusted)
       const maxDimension = parseInt(req.body.maxDimension) || 4096;
 
-      const pythonArgs = [scriptPath, inputPath, outputPath];
-      if (quality !== 95) {
-        pythonArgs.push("--quality", quality.toString());
-      }
-      if (!preserveTransparency) {
-        pythonArgs.push("--no-transparency");
-      }
-      if (maxDimension !== 8192) {
-        pythonArgs.push("--max-dimension", maxDimension.toString());
-      }
-
-      const python = spawn("/opt/venv/bin/python", pythonArgs);
-
-      let stdout = "";
-      let stderr = "";
-
-      python.stdout.on("data", (data: Buffer) => {
-        stdout += data.toString();
-        console.log("HEIC to SVG stdout:", data.toString());
-      });
-
-      python.stderr.on("data", (data: Buffer) => {
-        stderr += data.toString();
-        console.log("HEIC to SVG stderr:", data.toString());
+      // Run through the resident HEIC worker instead of spawning a fresh
+      // Python process (and re-initialising pillow-heif) per request
+      const result = await runHeicWorkerJob("svg", inputPath, outputPath, {
+        quality,
+        preserve_transparency: preserveTransparency,
+        max_dimension: maxDimension,
       });
+      console.log("HEIC to SVG: Worker finished, ok:", result.ok);
 
-      python.on("close", async (code: number) => {
-        console.log("HEIC to SVG: Python script finished with code:", code);
-        console.log("HEIC to SVG: stdout:", stdout);
-        console.log("HEIC to SVG: stderr:", stderr);
-
-        try {
-          if (
-            code === 0 &&
-            (await fs
-              .access(outputPath)
-              .then(() => true)
-              .catch(() => false))
-          ) {
-            const outputBuffer = await fs.readFile(outputPath);
-            console.log("HEIC to SVG: Output file size:", outputBuffer.length);
-            res.set({
-              "Content-Type": "image/svg+xml",
-              "Content-Disposition": `attachment; filename="${path.basename(
-                outputPath
-              )}"`,
-              "Access-Control-Allow-Origin": "*",
-              "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-              "Access-Control-Allow-Headers":
-                "Content-Type, Authorization, Accept",
-            });
-            res.send(outputBuffer);
-          } else {
-            console.error(
-              "HEIC to SVG conversion failed. Code:",
-              code,
-              "Stderr:",
-              stderr
-            );
-            res.set({
-              "Access-Control-Allow-Origin": "*",
-              "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
-              "Access-Control-Allow-Headers":
-                "Content-Type, Authorization, Accept",
-            });
-            res
-              .status(500)
-              .json({ error: "Conversion failed", details: stderr });
-          }
-        } catch (error) {
-          console.error("Error handling conversion result:", error);
+      try {
+        if (
+          result.ok &&
+          (await fs
+            .access(outputPath)
+            .then(() => true)
+            .catch(() => false))
+        ) {
+          const outputBuffer = await fs.readFile(outputPath);
+          console.log("HEIC to SVG: Output file size:", outputBuffer.length);
+          res.set({
+            "Content-Type": "image/svg+xml",
+            "Content-Disposition": `attachment; filename="${path.basename(
+              outputPath
+            )}"`,
+            "Access-Control-Allow-Origin": "*",
+            "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+            "Access-Control-Allow-Headers":
+              "Content-Type, Authorization, Accept",
+          });
+          res.send(outputBuffer);
+        } else {
+          console.error(
+            "HEIC to SVG conversion failed:",
+            result.error,
+            "Stderr:",
+            result.stderr
+          );
           res.set({
             "Access-Control-Allow-Origin": "*",
             "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
@@ -27406,14 +27565,26 @@ app.post(
           });
           res.status(500).json({
             error: "Conversion failed",
-            details: error instanceof Error ? error.message : "Unknown error",
+            details: result.stderr || result.error,
           });
-        } finally {
-          await fs
-            .rm(tmpDir, { recursive: true, force: true })
-            .catch(() => undefined);
         }
-      });
+      } catch (error) {
+        console.error("Error handling conversion result:", error);
+        res.set({
+          "Access-Control-Allow-Origin": "*",
+          "Access-Control-Allow-Methods": "GET, POST, PUT, DELETE, OPTIONS",
+          "Access-Control-Allow-Headers":
+            "Content-Type, Authorization, Accept",
+        });
+        res.status(500).json({
+          error: "Conversion failed",
+          details: error instanceof Error ? error.message : "Unknown error",
+        });
+      } finally {
+        await fs
+          .rm(tmpDir, { recursive: true, force: true })
+          .catch(() => undefined);
+      }
     } catch (error) {
       console.error("HEIC to SVG conversion error:", error);
       const message = error instanceof Error ? error.message : "Unknown error";
@@ -29674,7 +29845,7 @@ app.post(
 
       const quality = parseInt(req.body.quality) || 95;
       const maxDimension = parseInt(req.body.maxDimension) || 4096;
-      const compression = req.body.compression || "tiff_lzw";
+      const compression = req.body.compression || "tiff_adobe_deflate";
 
       const pythonArgs = [
         scriptPath,
@@ -29885,7 +30056,7 @@ app.post("/convert/heic-to-tiff/batch", uploadBatch, async (req, res) => {
     const results: any[] = [];
     const quality = parseInt(req.body.quality) || 95;
     const maxDimension = parseInt(req.body.maxDimension) || 4096;
-    const compression = req.body.compression || "tiff_lzw";
+    const compression = req.body.compression || "tiff_adobe_deflate";
 
     for (const file of files) {
       try {
@@ -30039,10 +30210,52 @@ server.timeout = 15 * 60 * 1000; // 15 minutes
 server.keepAliveTimeout = 15 * 60 * 1000; // 15 minutes
 server.headersTimeout = 15 * 60 * 1000 + 1000; // 15 minutes + 1 second
 
+// Persistent LibreOffice listener for DOCX previews (viewers/docx_to_html.py
+// --serve-listener). Supervised here: restarted with backoff if it exits and
+// stopped on shutdown. Set DOCX_LISTENER=0 to run previews without it.
+let docxListener: ChildProcess | null = null;
+let docxListenerStopping = false;
+let docxListenerRestartMs = 5000;
+
+const startDocxListener = () => {
+  const pythonPath = process.env.PYTHON_PATH || "python3";
+  const scriptPath = path.join(__dirname, "..", "viewers", "docx_to_html.py");
+  const startedAt = Date.now();
+  const child = spawn(pythonPath, [scriptPath, "--serve-listener"], {
+    stdio: ["ignore", "inherit", "inherit"],
+  });
+  docxListener = child;
+
+  child.on("error", (error: Error) => {
+    console.error("DOCX listener: Failed to start:", error);
+  });
+
+  child.on("exit", (code: number | null) => {
+    docxListener = null;
+    if (docxListenerStopping) return;
+    // Reset the backoff after a run that stayed up, double it after a crash loop
+    docxListenerRestartMs =
+      Date.now() - startedAt > 60 * 1000
+        ? 5000
+        : Math.min(docxListenerRestartMs * 2, 5 * 60 * 1000);
+    console.warn(
+      `DOCX listener exited with code ${code}, restarting in ${docxListenerRestartMs / 1000}s`
+    );
+    setTimeout(startDocxListener, docxListenerRestartMs);
+  });
+};
+
+if (process.env.DOCX_LISTENER !== "0") {
+  startDocxListener();
+}
+
 // Graceful shutdown
 const gracefulShutdown = (signal: string) => {
   console.log(`\n${signal} received. Shutting down gracefully...`);
 
+  docxListenerStopping = true;
+  docxListener?.kill("SIGTERM");
+
   server.close(() => {
     console.log("✅ HTTP server closed");
     process.exit(0);
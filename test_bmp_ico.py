@@ -5,6 +5,8 @@ Test script for BMP to ICO conversion
 
 import sys
 import os
+import tempfile
+from PIL import Image
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 SCRIPTS_DIR = os.path.join(CURRENT_DIR, 'scripts')
 if SCRIPTS_DIR not in sys.path:
@@ -12,23 +14,21 @@ if SCRIPTS_DIR not in sys.path:
 
 from bmp_to_ico import create_ico_from_bmp
 
+# Simple test image (red square), built once for repeated runs
+_TEST_IMG = Image.new('RGB', (32, 32), (255, 0, 0))
+
 def test_bmp_conversion():
     """Test BMP to ICO conversion with a simple test"""
     print("Testing BMP to ICO conversion...")
     
-    # Create a simple test BMP file
-    from PIL import Image
-    import tempfile
-    
-    # Create a simple test image
-    test_img = Image.new('RGB', (32, 32), (255, 0, 0))  # Red square
+    # mkstemp only creates the paths; PIL writes the files itself
+    fd_bmp, bmp_file = tempfile.mkstemp(suffix='.bmp')
+    os.close(fd_bmp)
+    fd_ico, ico_file = tempfile.mkstemp(suffix='.ico')
+    os.close(fd_ico)
     
-    with tempfile.NamedTemporaryFile(suffix='.bmp', delete=False) as tmp_bmp:
-        test_img.save(tmp_bmp.name, 'BMP')
-        bmp_file = tmp_bmp.name
-    
-    with tempfile.NamedTemporaryFile(suffix='.ico', delete=False) as tmp_ico:
-        ico_file = tmp_ico.name
+    # Create a simple test BMP file
+    _TEST_IMG.save(bmp_file, 'BMP')
     
     try:
         print(f"Test BMP file: {bmp_file}")
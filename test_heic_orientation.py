@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Regression test: rotated HEIC input must be rotated exactly once
+(libheif already applies the rotation, so the EXIF orientation must not be applied again)
+"""
+
+import sys
+import os
+import tempfile
+from PIL import Image
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+SCRIPTS_DIR = os.path.join(CURRENT_DIR, 'scripts')
+if SCRIPTS_DIR not in sys.path:
+    sys.path.append(SCRIPTS_DIR)
+
+from heic_to_webp import convert_heic_to_webp
+from heif_to_jpg import convert_heif_to_jpg
+
+# Landscape test image stored with EXIF orientation 6 (rotate 90° CW), so it displays as portrait
+_TEST_IMG = Image.new('RGB', (64, 32), (255, 0, 0))
+_EXPECTED_SIZE = (32, 64)
+
+
+def _make_rotated_heic():
+    """Write the test image as a HEIC with orientation 6 and return its path"""
+    fd_heic, heic_file = tempfile.mkstemp(suffix='.heic')
+    os.close(fd_heic)
+    exif = Image.Exif()
+    exif[0x0112] = 6
+    _TEST_IMG.save(heic_file, 'HEIF', exif=exif.tobytes())
+    return heic_file
+
+
+def _check_conversion(name, convert, suffix):
+    """Convert the rotated HEIC with convert(input, output) and check the output is portrait"""
+    print(f"Testing rotated HEIC to {name} conversion...")
+
+    heic_file = _make_rotated_heic()
+    fd_out, out_file = tempfile.mkstemp(suffix=suffix)
+    os.close(fd_out)
+
+    try:
+        if not convert(heic_file, out_file):
+            print(f"❌ Rotated HEIC to {name} test FAILED: conversion failed")
+            return False
+
+        with Image.open(out_file) as out:
+            size = out.size
+            orientation = out.getexif().get(0x0112, 1)
+
+        if size == _EXPECTED_SIZE and orientation == 1:
+            print(f"✅ Rotated HEIC to {name} test PASSED")
+            return True
+        else:
+            print(f"❌ Rotated HEIC to {name} test FAILED: size {size}, orientation {orientation}, expected {_EXPECTED_SIZE} upright")
+            return False
+
+    except Exception as e:
+        print(f"❌ Rotated HEIC to {name} test FAILED with error: {e}")
+        return False
+    finally:
+        # Cleanup
+        try:
+            os.unlink(heic_file)
+            os.unlink(out_file)
+        except:
+            pass
+
+
+def test_heic_to_webp_orientation():
+    return _check_conversion('WebP', convert_heic_to_webp, '.webp')
+
+
+def test_heif_to_jpg_orientation():
+    return _check_conversion('JPG', convert_heif_to_jpg, '.jpg')
+
+
+if __name__ == "__main__":
+    results = [test_heic_to_webp_orientation(), test_heif_to_jpg_orientation()]
+    sys.exit(0 if all(results) else 1)
@@ -3,13 +3,58 @@ Modified DOCX to HTML converter for A4 page format
 This version outputs HTML that's optimized for A4 page splitting in the frontend
 """
 
+import io
 import os
 import re
+from concurrent.futures import ProcessPoolExecutor
 from docx import Document
 from docx.shared import Inches, Pt, RGBColor
 from docx.enum.text import WD_ALIGN_PARAGRAPH
+from docx.oxml.ns import qn
 from html import escape
 
+_W_P = qn('w:p')
+_W_TBL = qn('w:tbl')
+_W_R = qn('w:r')
+_W_RPR = qn('w:rPr')
+_W_B = qn('w:b')
+_W_I = qn('w:i')
+_W_U = qn('w:u')
+_W_SZ = qn('w:sz')
+_W_COLOR = qn('w:color')
+_W_VAL = qn('w:val')
+
+# Minimum body elements per worker before rendering is split across processes
+_PARALLEL_MIN_ELEMENTS = 2000
+
+# Paragraph style name (lower-cased) -> HTML tag
+_STYLE_TAGS = {
+    'heading 1': 'h1', 'heading1': 'h1',
+    'heading 2': 'h2', 'heading2': 'h2',
+    'heading 3': 'h3', 'heading3': 'h3',
+    'heading 4': 'h4', 'heading4': 'h4',
+    'heading 5': 'h5', 'heading5': 'h5',
+    'heading 6': 'h6', 'heading6': 'h6',
+}
+
+# clean_html patterns, compiled once
+_RE_NEWLINES = re.compile(r'\n{3,}')
+_RE_TAG_GAP = re.compile(r'>\s+<')
+# Block-level closing tag (group 1) or opening tag (group 2), handled in one scan
+_RE_BLOCK_TAG = re.compile(r'(</(?:p|div|h[1-6]|li|table)>)|(<(?:p|div|h[1-6]|li|table)[^>]*>)')
+
+# Table cell markup around the escaped cell content
+_CELL_STYLE = ' style="border: 1px solid #ddd; padding: 8px;">'
+_TH_OPEN, _TH_CLOSE = '<th' + _CELL_STYLE, '</th>'
+_TD_OPEN, _TD_CLOSE = '<td' + _CELL_STYLE, '</td>'
+
+
+def _space_block_tag(match):
+    """Newline after a closing block tag, before an opening one."""
+    if match.group(1):
+        return match.group(1) + '\n'
+    return '\n' + match.group(2)
+
 
 def docx_to_html(docx_path):
     """
@@ -18,16 +63,18 @@ def docx_to_html(docx_path):
     Returns HTML string with clean, block-level elements that can be easily split into pages.
     """
     doc = Document(docx_path)
-    html_parts = []
+    body_map = build_body_map(doc)
     
-    # Process each paragraph and table
-    for element in doc.element.body:
-        if element.tag.endswith('p'):  # Paragraph
-            para = element
-            html_parts.append(process_paragraph(para, doc))
-        elif element.tag.endswith('tbl'):  # Table
-            table = element
-            html_parts.append(process_table(table, doc))
+    # Large documents are rendered in contiguous slices across processes (python-docx
+    # is pure Python, so threads would not help); each worker re-opens the document
+    workers = min(os.cpu_count() or 1, len(body_map) // _PARALLEL_MIN_ELEMENTS)
+    if workers > 1 and isinstance(docx_path, str):
+        step = -(-len(body_map) // workers)
+        jobs = [(docx_path, lo, lo + step) for lo in range(0, len(body_map), step)]
+        with ProcessPoolExecutor(max_workers=len(jobs)) as pool:
+            html_parts = list(pool.map(_render_range, jobs))
+    else:
+        html_parts = [render_elements(body_map)]
     
     # Join all HTML parts
     html_content = '\n'.join(html_parts)
@@ -36,18 +83,50 @@ def docx_to_html(docx_path):
     return html_content
 
 
-def process_paragraph(para, doc):
-    """Process a paragraph element and return HTML."""
-    # Get paragraph properties
-    para_obj = None
-    for p in doc.paragraphs:
-        if p._element == para:
-            para_obj = p
-            break
+def render_elements(body_map):
+    """Render ('p'|'t', object) body entries in order and return their HTML."""
+    html_parts = []
     
-    if not para_obj:
-        return ''
+    # Paragraph style id -> lower-cased style name, filled in as styles are seen
+    style_names = {}
     
+    # Process each paragraph and table, in document order
+    for kind, obj in body_map:
+        if kind == 'p':  # Paragraph
+            html_parts.append(process_paragraph(obj, style_names))
+        else:  # Table
+            html_parts.append(process_table(obj))
+    
+    return '\n'.join(html_parts)
+
+
+def _render_range(job):
+    """Process-pool worker: render body elements [lo, hi) of a DOCX file."""
+    docx_path, lo, hi = job
+    return render_elements(build_body_map(Document(docx_path))[lo:hi])
+
+
+def build_body_map(doc):
+    """
+    Resolve the body's paragraphs and tables to python-docx objects in one ordered walk.
+    
+    Returns a list of ('p', Paragraph) / ('t', Table) tuples in document order.
+    doc.paragraphs and doc.tables list the body's w:p / w:tbl children in that same
+    order, so each element is paired with the next object instead of being searched for.
+    """
+    paragraphs = iter(doc.paragraphs)
+    tables = iter(doc.tables)
+    body_map = []
+    for element in doc.element.body:
+        if element.tag == _W_P:
+            body_map.append(('p', next(paragraphs)))
+        elif element.tag == _W_TBL:
+            body_map.append(('t', next(tables)))
+    return body_map
+
+
+def process_paragraph(para_obj, style_names):
+    """Process a paragraph and return HTML."""
     # Check if paragraph is empty
     if not para_obj.text.strip():
         return '<p>&nbsp;</p>'
@@ -63,123 +142,121 @@ def process_paragraph(para, doc):
         align_style = 'text-align: justify;'
     
     # Get paragraph style (heading, etc.)
-    style_name = para_obj.style.name.lower()
-    tag = 'p'
-    
-    if 'heading 1' in style_name or 'heading1' in style_name:
-        tag = 'h1'
-    elif 'heading 2' in style_name or 'heading2' in style_name:
-        tag = 'h2'
-    elif 'heading 3' in style_name or 'heading3' in style_name:
-        tag = 'h3'
-    elif 'heading 4' in style_name or 'heading4' in style_name:
-        tag = 'h4'
-    elif 'heading 5' in style_name or 'heading5' in style_name:
-        tag = 'h5'
-    elif 'heading 6' in style_name or 'heading6' in style_name:
-        tag = 'h6'
-    elif 'list' in style_name:
-        tag = 'li'
+    # (para_obj.style searches the styles part on every call, which dominates on
+    # large documents, so resolve each style id once)
+    style_id = para_obj._p.style
+    style_name = style_names.get(style_id)
+    if style_name is None:
+        style_name = style_names[style_id] = para_obj.style.name.lower()
+    tag = _STYLE_TAGS.get(style_name, 'li' if 'list' in style_name else 'p')
     
     # Process runs (text with formatting)
-    inner_html = process_runs(para_obj.runs)
+    inner_html = process_runs(para_obj._p)
     
     # Build paragraph HTML
     style_attr = f' style="{align_style}"' if align_style else ''
     return f'<{tag}{style_attr}>{inner_html}</{tag}>'
 
 
-def process_runs(runs):
-    """Process paragraph runs and return HTML with formatting."""
-    html_parts = []
+def _on(el):
+    """Whether a w:b / w:i style toggle element is switched on."""
+    return el is not None and el.get(_W_VAL) not in ('0', 'false', 'off')
+
+
+def process_runs(p_el):
+    """
+    Process a paragraph's runs and return HTML with formatting.
     
-    for run in runs:
-        text = escape(run.text)
+    Reads the direct run formatting straight from the w:r / w:rPr XML of the
+    paragraph element instead of going through python-docx Run/Font wrappers,
+    which build new Python objects on every attribute access.
+    """
+    buf = io.StringIO()
+    
+    for r in p_el.iterchildren(_W_R):
+        text = escape(r.text)
         if not text:
             continue
         
         # Build style string
         styles = []
+        rpr = r.find(_W_RPR)
         
-        # Bold
-        if run.bold:
-            styles.append('font-weight: bold;')
-        
-        # Italic
-        if run.italic:
-            styles.append('font-style: italic;')
-        
-        # Underline
-        if run.underline:
-            styles.append('text-decoration: underline;')
-        
-        # Font size
-        if run.font.size:
-            size_pt = run.font.size.pt
-            styles.append(f'font-size: {size_pt}pt;')
-        
-        # Font color
-        if run.font.color and run.font.color.rgb:
-            rgb = run.font.color.rgb
-            color = f'#{rgb:06x}'
-            styles.append(f'color: {color};')
+        if rpr is not None:
+            # Bold
+            if _on(rpr.find(_W_B)):
+                styles.append('font-weight: bold;')
+            
+            # Italic
+            if _on(rpr.find(_W_I)):
+                styles.append('font-style: italic;')
+            
+            # Underline
+            u = rpr.find(_W_U)
+            if u is not None and u.get(_W_VAL, 'none') != 'none':
+                styles.append('text-decoration: underline;')
+            
+            # Font size (w:sz is in half-points)
+            sz = rpr.find(_W_SZ)
+            if sz is not None and sz.get(_W_VAL):
+                size_pt = int(sz.get(_W_VAL)) / 2
+                styles.append(f'font-size: {size_pt}pt;')
+            
+            # Font color
+            color = rpr.find(_W_COLOR)
+            if color is not None and color.get(_W_VAL, 'auto') != 'auto':
+                styles.append(f'color: #{color.get(_W_VAL).lower()};')
         
         # Build HTML
         if styles:
             style_str = ' '.join(styles)
-            html_parts.append(f'<span style="{style_str}">{text}</span>')
+            buf.write(f'<span style="{style_str}">{text}</span>')
         else:
-            html_parts.append(text)
+            buf.write(text)
     
-    return ''.join(html_parts)
+    return buf.getvalue()
 
 
-def process_table(table, doc):
-    """Process a table element and return HTML."""
-    html_parts = ['<table style="width: 100%; border-collapse: collapse; margin: 10px 0;">']
+def process_table(table_obj):
+    """Process a table and return HTML."""
+    buf = io.StringIO()
+    buf.write('<table style="width: 100%; border-collapse: collapse; margin: 10px 0;">')
     
-    # Find the table object
-    table_obj = None
-    for t in doc.tables:
-        if t._element == table:
-            table_obj = t
-            break
-    
-    if not table_obj:
-        return ''
-    
-    # Process rows
-    for row in table_obj.rows:
-        html_parts.append('<tr>')
+    # Process rows. table_obj.rows rebuilds its list from the XML on every access,
+    # so read it once; the first row is the header row
+    rows = list(table_obj.rows)
+    header_row = rows[0] if rows else None
+    for row in rows:
+        buf.write('<tr>')
+        
+        if row is header_row:
+            cell_open, cell_close = _TH_OPEN, _TH_CLOSE
+        else:
+            cell_open, cell_close = _TD_OPEN, _TD_CLOSE
         
         for cell in row.cells:
             # Get cell content
             cell_text = cell.text.strip()
             cell_html = escape(cell_text) if cell_text else '&nbsp;'
             
-            # Check if it's a header row (first row)
-            is_header = row == table_obj.rows[0]
-            tag = 'th' if is_header else 'td'
-            
-            html_parts.append(f'<{tag} style="border: 1px solid #ddd; padding: 8px;">{cell_html}</{tag}>')
+            buf.write(cell_open + cell_html + cell_close)
         
-        html_parts.append('</tr>')
+        buf.write('</tr>')
     
-    html_parts.append('</table>')
-    return ''.join(html_parts)
+    buf.write('</table>')
+    return buf.getvalue()
 
 
 def clean_html(html):
     """Clean up HTML - remove extra whitespace, fix common issues."""
     # Remove multiple consecutive newlines
-    html = re.sub(r'\n{3,}', '\n\n', html)
+    html = _RE_NEWLINES.sub('\n\n', html)
     
     # Remove whitespace between tags
-    html = re.sub(r'>\s+<', '><', html)
+    html = _RE_TAG_GAP.sub('><', html)
     
     # Ensure proper spacing around block elements
-    html = re.sub(r'(</(?:p|div|h[1-6]|li|table)>)', r'\1\n', html)
-    html = re.sub(r'(<(?:p|div|h[1-6]|li|table)[^>]*>)', r'\n\1', html)
+    html = _RE_BLOCK_TAG.sub(_space_block_tag, html)
     
     return html.strip()
 
@@ -8,12 +8,188 @@ import argparse
 import os
 import sys
 import subprocess
+import shutil
 import traceback
+import atexit
+import select
+import time
 import json
+import csv
+import importlib.util
+import importlib.metadata
+import multiprocessing as mp
+import multiprocessing.util
 from PIL import Image
 import io
+import mmap
+import struct
 from datetime import datetime
 
+# JPEG quality for the web preview
+PREVIEW_JPEG_QUALITY = 85
+
+# thumbnail() first shrinks with a cheap integer reduce() to within this factor of
+# the target, then runs LANCZOS on the smaller image; lower is faster, higher sharper
+PREVIEW_REDUCING_GAP = 2.0
+
+# Embedded JPEGs to try, best first; Canon CR2s almost always carry a full-size preview
+EMBEDDED_JPEG_TAGS = ['PreviewImage', 'JpgFromRaw', 'ThumbnailImage']
+
+# rawpy is imported on first use: loading LibRaw costs ~200ms, which CLI runs that
+# succeed on the embedded-JPEG fast path never need to pay
+_rawpy = None
+
+def _get_rawpy():
+    """Import rawpy once, on first use (raises ImportError if unavailable)"""
+    global _rawpy
+    if _rawpy is None:
+        import rawpy
+        _rawpy = rawpy
+    return _rawpy
+
+# Gamma LUT resolution for the quick demosaic (12-bit in, 8-bit out)
+_QUICK_LUT_SIZE = 4096
+
+# numba is imported and the kernel built on first use: importing numba alone costs
+# ~300ms, and only --quick-demosaic runs that reach the rawpy path need it
+_bayer_halfsize = None
+
+def _get_bayer_kernel():
+    """Import numba and build the Bayer binning kernel once (raises ImportError if unavailable)"""
+    global _bayer_halfsize
+    if _bayer_halfsize is None:
+        import numba
+        
+        @numba.njit(parallel=True, cache=True, fastmath=True)
+        def bayer_halfsize(bayer, pattern, black, scale, lut, out):
+            """
+            2x2 Bayer bin: every sensor quad becomes one RGB pixel (the two greens are
+            averaged), with per-channel black level, white balance / white level scaling
+            and a gamma LUT folded into the same pass. No demosaic, no colour matrix.
+            """
+            top = lut.shape[0] - 1
+            for y in numba.prange(out.shape[0]):
+                for x in range(out.shape[1]):
+                    r = 0.0
+                    g = 0.0
+                    b = 0.0
+                    for dy in range(2):
+                        for dx in range(2):
+                            c = pattern[dy, dx]
+                            v = (bayer[2 * y + dy, 2 * x + dx] - black[c]) * scale[c]
+                            if c == 0:
+                                r = v
+                            elif c == 2:
+                                b = v
+                            else:
+                                g += 0.5 * v
+                    out[y, x, 0] = lut[min(max(int(r), 0), top)]
+                    out[y, x, 1] = lut[min(max(int(g), 0), top)]
+                    out[y, x, 2] = lut[min(max(int(b), 0), top)]
+        
+        _bayer_halfsize = bayer_halfsize
+    return _bayer_halfsize
+
+def _quick_halfsize(raw):
+    """
+    Half-size preview straight from the Bayer data with the Numba kernel.
+    Returns None when the sensor layout is not a plain 2x2 Bayer pattern;
+    raises ImportError if numba is not installed.
+    """
+    import numpy as np
+    
+    pattern = raw.raw_pattern
+    if pattern is None or pattern.shape != (2, 2) or raw.num_colors != 3:
+        return None
+    
+    bayer = raw.raw_image_visible
+    wb = list(raw.camera_whitebalance)
+    if not wb[3]:
+        wb[3] = wb[1]  # second green multiplier is often left at 0
+    black = np.array(raw.black_level_per_channel, dtype=np.float32)
+    # White balance relative to green, then map [black, white] onto the LUT range
+    scale = np.array([wb[c] / wb[1] * (_QUICK_LUT_SIZE - 1) / (raw.white_level - black[c]) for c in range(4)],
+                     dtype=np.float32)
+    lut = (255.0 * (np.arange(_QUICK_LUT_SIZE) / (_QUICK_LUT_SIZE - 1)) ** (1 / 2.2) + 0.5).astype(np.uint8)
+    
+    out = np.empty((bayer.shape[0] // 2, bayer.shape[1] // 2, 3), dtype=np.uint8)
+    _get_bayer_kernel()(bayer, pattern.astype(np.int64), black, scale, lut, out)
+    return out
+
+# exiftool availability, probed once per process on first use
+_EXIFTOOL_PATH = None
+_EXIFTOOL_CHECKED = False
+
+def _exiftool_available():
+    """Whether exiftool is on PATH; a PATH lookup, no Perl startup"""
+    global _EXIFTOOL_PATH, _EXIFTOOL_CHECKED
+    if not _EXIFTOOL_CHECKED:
+        _EXIFTOOL_PATH = shutil.which('exiftool')
+        _EXIFTOOL_CHECKED = True
+        print(f"exiftool: {_EXIFTOOL_PATH or 'not found'}")
+    return _EXIFTOOL_PATH is not None
+
+class _ExiftoolDaemon:
+    """
+    One long-lived `exiftool -stay_open` process shared by all extractions, so the
+    Perl startup (~150ms) is paid once per process instead of once per file.
+    Commands are written to its stdin; each answer ends with a {readyN} marker.
+    """
+    _instance = None
+
+    @classmethod
+    def instance(cls):
+        """Return the running daemon, starting one if needed (raises FileNotFoundError without exiftool)"""
+        if cls._instance is None or cls._instance.proc.poll() is not None:
+            cls._instance = cls()
+            atexit.register(cls._instance.close)
+            # Pool workers exit without running atexit hooks, but do run these
+            multiprocessing.util.Finalize(cls._instance, cls._instance.close, exitpriority=10)
+        return cls._instance
+
+    def __init__(self):
+        self.proc = subprocess.Popen(
+            ['exiftool', '-stay_open', 'True', '-@', '-', '-common_args', '-b'],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL
+        )
+        self._seq = 0
+
+    def extract(self, tag, path, timeout=30):
+        """Return the binary value of a tag (empty if the file has none)"""
+        self._seq += 1
+        marker = f"{{ready{self._seq}}}\n".encode()
+        self.proc.stdin.write(f"-{tag}\n".encode() + os.fsencode(path) + f"\n-execute{self._seq}\n".encode())
+        self.proc.stdin.flush()
+
+        fd = self.proc.stdout.fileno()
+        buf = bytearray()
+        deadline = time.monotonic() + timeout
+        while not buf.endswith(marker):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([fd], [], [], remaining)[0]:
+                self.proc.kill()
+                raise subprocess.TimeoutExpired('exiftool', timeout)
+            chunk = os.read(fd, 1 << 16)
+            if not chunk:
+                raise RuntimeError("exiftool exited unexpectedly")
+            buf += chunk
+        # One copy out of the read buffer (slicing the bytearray first would add another);
+        # io.BytesIO() then shares the bytes object without copying it again
+        return bytes(memoryview(buf)[:-len(marker)])
+
+    def close(self):
+        """Ask exiftool to exit; kill it if it does not"""
+        if self.proc.poll() is not None:
+            return
+        try:
+            self.proc.stdin.write(b"-stay_open\nFalse\n")
+            self.proc.stdin.flush()
+            self.proc.wait(timeout=5)
+        except Exception:
+            self.proc.kill()
+
 def extract_exif_metadata(cr2_file):
     """
     Extract EXIF metadata from CR2 file using exiftool.
@@ -104,55 +280,150 @@ def extract_exif_metadata(cr2_file):
     
     return metadata
 
-def extract_embedded_jpeg(cr2_file, output_file):
+def _ifd_values(mm, endian, entry, typ, count):
+    """Values of a SHORT/LONG TIFF IFD entry (inline when they fit in 4 bytes)"""
+    fmt = {3: 'H', 4: 'I'}.get(typ)
+    if fmt is None:
+        return []
+    size = struct.calcsize(fmt) * count
+    where = entry + 8 if size <= 4 else struct.unpack_from(endian + 'I', mm, entry + 8)[0]
+    return list(struct.unpack_from(endian + fmt * count, mm, where))
+
+def _read_cr2_preview(cr2_file):
+    """
+    Read the full-size preview JPEG of a Canon CR2 straight from the file, without exiftool.
+    CR2 is TIFF-based ("II*\\0" + IFD0 offset, then "CR" at byte 8) and IFD0's
+    StripOffsets/StripByteCounts point at the preview JPEG.
+    
+    Returns:
+        bytes: JPEG data, or None if the file is not a CR2 or has no such preview
+    """
+    with open(cr2_file, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        if len(mm) < 16 or mm[8:10] != b'CR':
+            return None
+        endian = {b'II': '<', b'MM': '>'}.get(mm[:2])
+        if endian is None:
+            return None
+        
+        ifd0 = struct.unpack_from(endian + 'I', mm, 4)[0]
+        offsets = lengths = None
+        for i in range(struct.unpack_from(endian + 'H', mm, ifd0)[0]):
+            entry = ifd0 + 2 + 12 * i
+            tag, typ, count = struct.unpack_from(endian + 'HHI', mm, entry)
+            if tag == 0x0111:  # StripOffsets
+                offsets = _ifd_values(mm, endian, entry, typ, count)
+            elif tag == 0x0117:  # StripByteCounts
+                lengths = _ifd_values(mm, endian, entry, typ, count)
+        if not offsets or not lengths or len(offsets) != len(lengths):
+            return None
+        
+        # The largest strip is the preview JPEG
+        start, size = max(zip(offsets, lengths), key=lambda strip: strip[1])
+        if start + size > len(mm) or mm[start:start + 2] != b'\xff\xd8':
+            return None
+        return bytes(mm[start:start + size])
+
+def _save_embedded_preview(data, label, output_file, max_dimension, min_dimension=None):
     """
-    Fast preview using exiftool to extract embedded JPEG (no demosaic).
+    Downscale and save an embedded JPEG as the preview. A JPEG that already fits
+    within max_dimension is written out as-is, with no decode or re-encode.
+    
+    Returns:
+        bool: True if saved, False if it is smaller than min_dimension
+              (default: max_dimension)
+    """
+    if min_dimension is None:
+        min_dimension = max_dimension
+    
+    # Open with Pillow to read the size (lazy: only the JPEG header is parsed)
+    img = Image.open(io.BytesIO(data))
+    print(f"Embedded {label} size: {img.size}")
+    
+    if max(img.size) < min_dimension:
+        print(f"{label} is smaller than {min_dimension}px")
+        return False
+    
+    if max(img.size) <= max_dimension:
+        with open(output_file, 'wb') as f:
+            f.write(data)
+        print(f"Fast preview written as-is: {len(data)} bytes")
+        return True
+    
+    # Let libjpeg decode straight to a 1/2, 1/4 or 1/8 scale that still
+    # covers max_dimension (DCT scaling), instead of a full-size decode
+    full_size = img.size
+    img.draft('RGB', (max_dimension, max_dimension))
+    img.load()
+    if img.size != full_size:
+        print(f"Decoded at reduced scale: {img.size}")
+    
+    # Resize the rest of the way if still too large for web
+    if img.width > max_dimension or img.height > max_dimension:
+        print(f"Resizing to fit within {max_dimension}px...")
+        img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=PREVIEW_REDUCING_GAP)
+        print(f"Resized to: {img.size}")
+    
+    # Re-encode with Pillow's 'web_high' quantization preset and 4:2:0 chroma
+    # (what Canon's own preview uses); no optimize=True or progressive, which
+    # each cost extra entropy-coding passes for a smaller file
+    img.save(output_file, 'JPEG', subsampling=2, qtables='web_high')
+    
+    if os.path.exists(output_file):
+        file_size = os.path.getsize(output_file)
+        print(f"Fast preview created: {file_size} bytes")
+        return True
+    return False
+
+def extract_embedded_jpeg(cr2_file, output_file, max_dimension=2048):
+    """
+    Fast preview from an embedded JPEG (no demosaic).
+    First reads the CR2's IFD0 preview directly from the file; if that is missing
+    or too small, tries each of EMBEDDED_JPEG_TAGS through exiftool and uses the
+    first one that is at least max_dimension on its longest side.
     
     Args:
         cr2_file (str): Path to input CR2 file
         output_file (str): Path to output image file
+        max_dimension (int): Maximum width or height for output (default: 2048)
     
     Returns:
         bool: True if extraction successful, False otherwise
     """
+    print("Attempting fast preview from the CR2 preview strip...")
+    
+    try:
+        data = _read_cr2_preview(cr2_file)
+        if data is None:
+            print("No preview strip in IFD0")
+        else:
+            print(f"Preview strip read: {len(data)} bytes")
+            # IFD0 holds the full-size preview, as large as the camera renders the
+            # image, so it is used even when smaller than max_dimension
+            if _save_embedded_preview(data, 'IFD0 preview', output_file, max_dimension, min_dimension=0):
+                return True
+    except Exception as e:
+        print(f"WARNING: Reading the preview strip failed: {e}")
+    
     print(f"Attempting fast preview with exiftool (embedded JPEG)...")
     
+    if not _exiftool_available():
+        print("WARNING: exiftool not found, will use rawpy instead")
+        return False
+    
     try:
-        # Try to extract embedded JPEG preview with exiftool
-        cmd = [
-            'exiftool',
-            '-b',
-            '-PreviewImage',
-            cr2_file
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            timeout=30
-        )
-        
-        if result.returncode == 0 and len(result.stdout) > 1000:
-            # Valid JPEG data extracted
-            print(f"Embedded JPEG extracted: {len(result.stdout)} bytes")
+        exiftool = _ExiftoolDaemon.instance()
+        for tag in EMBEDDED_JPEG_TAGS:
+            # Try to extract this embedded JPEG through the resident exiftool
+            data = exiftool.extract(tag, cr2_file)
             
-            # Open with Pillow to resize if needed
-            img = Image.open(io.BytesIO(result.stdout))
-            print(f"Embedded JPEG size: {img.size}")
+            if len(data) <= 1000:
+                print(f"No usable {tag} in file")
+                continue
             
-            # Resize if too large for web (max 2048px)
-            max_dimension = 2048
-            if img.width > max_dimension or img.height > max_dimension:
-                print(f"Resizing to fit within {max_dimension}px...")
-                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
-                print(f"Resized to: {img.size}")
-            
-            # Save as JPEG
-            img.save(output_file, 'JPEG', quality=92, optimize=True)
+            # Valid JPEG data extracted
+            print(f"Embedded {tag} extracted: {len(data)} bytes")
             
-            if os.path.exists(output_file):
-                file_size = os.path.getsize(output_file)
-                print(f"Fast preview created: {file_size} bytes")
+            if _save_embedded_preview(data, tag, output_file, max_dimension):
                 return True
         
         return False
@@ -164,14 +435,24 @@ def extract_embedded_jpeg(cr2_file, output_file):
         print(f"WARNING: exiftool extraction failed: {e}")
         return False
 
-def convert_cr2_with_rawpy(cr2_file, output_file, max_dimension=2048):
+def convert_cr2_with_rawpy(cr2_file, output_file, max_dimension=2048, quick_demosaic=False):
     """
     Full RAW processing with rawpy (LibRaw) and Pillow.
     
+    Tuned for downscaled previews: bilinear demosaic (user_qual=0) instead of AHD,
+    and half_size (one RGB pixel per Bayer quad, no demosaic) when the sensor is
+    more than twice max_dimension. The quality difference is not visible after the
+    downscale to max_dimension, but full-size output would look softer.
+    
+    With quick_demosaic (and Numba installed), half-size output is binned from the
+    Bayer data by a JIT-compiled kernel instead of LibRaw: faster still, but without
+    the camera colour matrix or auto brightness, so colours are less accurate.
+    
     Args:
         cr2_file (str): Path to input CR2 file
         output_file (str): Path to output image file
         max_dimension (int): Maximum width or height for output (default: 2048)
+        quick_demosaic (bool): Use the Numba Bayer binning for half-size output
     
     Returns:
         bool: True if conversion successful, False otherwise
@@ -179,7 +460,7 @@ def convert_cr2_with_rawpy(cr2_file, output_file, max_dimension=2048):
     print(f"Processing CR2 with rawpy (LibRaw)...")
     
     try:
-        import rawpy
+        rawpy = _get_rawpy()
         
         # Open CR2 file
         print("Opening CR2 file with rawpy...")
@@ -188,33 +469,54 @@ def convert_cr2_with_rawpy(cr2_file, output_file, max_dimension=2048):
             print(f"RAW size: {raw.sizes.raw_width}x{raw.sizes.raw_height}")
             print(f"Output size: {raw.sizes.width}x{raw.sizes.height}")
             
-            # Process RAW with default settings (high quality)
-            print("Processing RAW data (demosaic, white balance, color correction)...")
-            rgb = raw.postprocess(
-                use_camera_wb=True,          # Use camera white balance
-                half_size=False,              # Full resolution
-                no_auto_bright=False,         # Auto brightness
-                output_bps=8,                 # 8-bit output for web
-                gamma=(2.222, 4.5),          # Standard gamma curve
-                output_color=rawpy.ColorSpace.sRGB,  # sRGB color space
-                user_flip=0                   # No rotation
-            )
+            # Half-size output is still larger than needed after the downscale
+            need_half = max(raw.sizes.width, raw.sizes.height) > 2 * max_dimension
+            
+            rgb = None
+            if quick_demosaic and need_half:
+                print("Binning Bayer data with Numba (quick demosaic)...")
+                try:
+                    rgb = _quick_halfsize(raw)
+                    if rgb is None:
+                        print("Sensor layout not supported by quick demosaic, using LibRaw")
+                except ImportError:
+                    print("WARNING: numba not available, using LibRaw")
+            
+            if rgb is None:
+                print(f"Processing RAW data (demosaic, white balance, color correction, half size: {need_half})...")
+                rgb = raw.postprocess(
+                    use_camera_wb=True,          # Use camera white balance
+                    half_size=need_half,          # Skip demosaic when downscaling 2x+ anyway
+                    user_qual=0,                  # Bilinear demosaic (fast)
+                    no_auto_bright=False,         # Auto brightness
+                    output_bps=8,                 # 8-bit output for web
+                    gamma=(2.222, 4.5),          # Standard gamma curve
+                    output_color=rawpy.ColorSpace.sRGB,  # sRGB color space
+                    user_flip=0                   # No rotation
+                )
             
             print(f"Processed RGB array shape: {rgb.shape}")
             
-            # Convert to PIL Image
-            img = Image.fromarray(rgb)
+            # Convert to PIL Image straight from the array's buffer (rawpy returns
+            # C-contiguous uint8 HxWx3 for output_bps=8), skipping fromarray()'s
+            # array-interface handling and any contiguity copy
+            if rgb.dtype != 'uint8' or rgb.ndim != 3 or rgb.shape[2] != 3:
+                raise ValueError(f"Unexpected RGB array from rawpy: {rgb.dtype} {rgb.shape}")
+            if not rgb.flags['C_CONTIGUOUS']:
+                rgb = rgb.copy(order='C')
+            h, w, _ = rgb.shape
+            img = Image.frombuffer('RGB', (w, h), rgb, 'raw', 'RGB', 0, 1)
             print(f"PIL Image size: {img.size}, mode: {img.mode}")
             
             # Resize if too large
             if img.width > max_dimension or img.height > max_dimension:
                 print(f"Resizing to fit within {max_dimension}px...")
-                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS)
+                img.thumbnail((max_dimension, max_dimension), Image.Resampling.LANCZOS, reducing_gap=PREVIEW_REDUCING_GAP)
                 print(f"Resized to: {img.size}")
             
             # Save as JPEG
             print("Saving as JPEG...")
-            img.save(output_file, 'JPEG', quality=92, optimize=True)
+            img.save(output_file, 'JPEG', quality=PREVIEW_JPEG_QUALITY)
             
             # Verify output
             if os.path.exists(output_file):
@@ -234,7 +536,7 @@ def convert_cr2_with_rawpy(cr2_file, output_file, max_dimension=2048):
         traceback.print_exc()
         return False
 
-def convert_cr2_to_image(cr2_file, output_file, fast=True, max_dimension=2048):
+def convert_cr2_to_image(cr2_file, output_file, fast=True, max_dimension=2048, quick_demosaic=False):
     """
     Convert CR2 to web-viewable image.
     
@@ -243,6 +545,7 @@ def convert_cr2_to_image(cr2_file, output_file, fast=True, max_dimension=2048):
         output_file (str): Path to output image file
         fast (bool): Try fast preview first (embedded JPEG)
         max_dimension (int): Maximum dimension for output
+        quick_demosaic (bool): Numba Bayer binning instead of LibRaw (see convert_cr2_with_rawpy)
     
     Returns:
         bool: True if conversion successful, False otherwise
@@ -263,53 +566,120 @@ def convert_cr2_to_image(cr2_file, output_file, fast=True, max_dimension=2048):
     
     # Try fast preview first if enabled
     if fast:
-        if extract_embedded_jpeg(cr2_file, output_file):
+        if extract_embedded_jpeg(cr2_file, output_file, max_dimension):
             print("Fast preview successful!")
             return True
         else:
             print("Fast preview not available, falling back to full RAW processing...")
     
     # Fall back to full RAW processing
-    return convert_cr2_with_rawpy(cr2_file, output_file, max_dimension)
+    return convert_cr2_with_rawpy(cr2_file, output_file, max_dimension, quick_demosaic)
+
+def convert_cr2_batch(manifest_file, fast=True, max_dimension=2048, processes=None, quick_demosaic=False):
+    """
+    Convert every CR2 listed in a manifest in parallel, one "input.cr2,output.jpg"
+    pair per line (CSV, so paths containing commas can be quoted). Conversion is CPU-bound (demosaic) and independent per file, so
+    it scales with cores; workers are recycled every 8 files to cap LibRaw heap growth.
+    
+    Args:
+        manifest_file (str): Path to manifest file
+        fast (bool): Try fast preview first (embedded JPEG)
+        max_dimension (int): Maximum dimension for output
+        processes (int): Worker processes (default: one per CPU)
+        quick_demosaic (bool): Numba Bayer binning instead of LibRaw (see convert_cr2_with_rawpy)
+    
+    Returns:
+        int: Number of failed conversions
+    
+    Raises:
+        ValueError: If a manifest line is not an input,output pair (names the line)
+    """
+    pairs = []
+    with open(manifest_file, 'r', encoding='utf-8', newline='') as f:
+        reader = csv.reader(f)
+        for row in reader:
+            fields = [field.strip() for field in row]
+            if not any(fields):
+                continue
+            if len(fields) != 2 or not all(fields):
+                raise ValueError(f"{manifest_file}: line {reader.line_num}: expected 'input.cr2,output.jpg', got {row!r}")
+            pairs.append(fields)
+    
+    jobs = []
+    for cr2_file, output_file in pairs:
+        output_dir = os.path.dirname(output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        jobs.append((cr2_file, output_file, fast, max_dimension, quick_demosaic))
+    
+    processes = processes or mp.cpu_count()
+    print(f"Batch: {len(jobs)} file(s) across {processes} worker(s)")
+    with mp.Pool(processes=processes, maxtasksperchild=8) as pool:
+        results = pool.starmap(convert_cr2_to_image, jobs, chunksize=1)
+        # Let workers exit normally (the with block alone terminates them), so each
+        # one shuts down its exiftool process
+        pool.close()
+        pool.join()
+    
+    failed = results.count(False)
+    print(f"Batch finished: {len(jobs) - failed} succeeded, {failed} failed")
+    return failed
+
+def _print_versions():
+    """Print library versions without importing rawpy (which initialises LibRaw)"""
+    import PIL
+    print(f"Pillow available: {PIL.__version__}")
+    if importlib.util.find_spec('rawpy') is not None:
+        print(f"rawpy available: {importlib.metadata.version('rawpy')}")
+    else:
+        print("WARNING: rawpy not available (pip install rawpy)")
+    print(f"numba available: {importlib.util.find_spec('numba') is not None}")
+    _exiftool_available()
 
 def main():
     parser = argparse.ArgumentParser(description='Convert CR2 (Canon RAW) to web-viewable image')
-    parser.add_argument('cr2_file', help='Input CR2 file path')
-    parser.add_argument('output_file', help='Output image file path (JPEG)')
-    parser.add_argument('metadata_file', help='Output metadata file path (JSON)')
+    parser.add_argument('cr2_file', nargs='?', help='Input CR2 file path')
+    parser.add_argument('output_file', nargs='?', help='Output image file path (JPEG)')
+    parser.add_argument('metadata_file', nargs='?', help='Output metadata file path (JSON)')
+    parser.add_argument('--manifest', metavar='FILE',
+                        help='Convert in parallel every "input.cr2,output.jpg" pair listed in FILE (no metadata is written)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Worker processes for --manifest (default: one per CPU)')
     parser.add_argument('--no-fast', action='store_true',
                         help='Skip fast preview, use full RAW processing')
     parser.add_argument('--max-dimension', type=int, default=2048,
                         help='Maximum width or height for output (default: 2048)')
+    parser.add_argument('--quick-demosaic', action='store_true',
+                        help='Bin Bayer data with Numba instead of LibRaw when no embedded JPEG is usable (faster, less accurate colour)')
+    parser.add_argument('-v', '--verbose', action='store_true',
+                        help='Print library versions before converting')
     
     args = parser.parse_args()
+    if not args.manifest and not (args.cr2_file and args.output_file and args.metadata_file):
+        parser.error("cr2_file, output_file and metadata_file are required unless --manifest is given")
     
     print("=== CR2 to Image Converter ===")
     print(f"Python version: {sys.version}")
     print(f"Working directory: {os.getcwd()}")
     print(f"Arguments: {vars(args)}")
     
-    # Check required libraries
-    try:
-        import rawpy
-        print(f"rawpy available: {rawpy.__version__}")
-    except ImportError:
-        print("WARNING: rawpy not available (pip install rawpy)")
+    if args.verbose:
+        _print_versions()
     
-    try:
-        from PIL import Image
-        print(f"Pillow available: {Image.__version__}")
-    except ImportError:
-        print("ERROR: Pillow not available (pip install Pillow)")
-        sys.exit(1)
-    
-    # Check exiftool
-    try:
-        result = subprocess.run(['exiftool', '-ver'], capture_output=True, text=True, timeout=5)
-        if result.returncode == 0:
-            print(f"exiftool available: {result.stdout.strip()}")
-    except:
-        print("WARNING: exiftool not available")
+    if args.manifest:
+        try:
+            failed = convert_cr2_batch(
+                args.manifest,
+                fast=not args.no_fast,
+                max_dimension=args.max_dimension,
+                processes=args.workers,
+                quick_demosaic=args.quick_demosaic
+            )
+        except ValueError as e:
+            print(f"ERROR: Invalid manifest: {e}")
+            sys.exit(1)
+        print("=== BATCH SUCCESSFUL ===" if failed == 0 else "=== BATCH FAILED ===")
+        sys.exit(0 if failed == 0 else 1)
     
     # Create output directory if needed
     output_dir = os.path.dirname(args.output_file)
@@ -330,7 +700,8 @@ def main():
         args.cr2_file,
         args.output_file,
         fast=not args.no_fast,
-        max_dimension=args.max_dimension
+        max_dimension=args.max_dimension,
+        quick_demosaic=args.quick_demosaic
     )
     
     if success:
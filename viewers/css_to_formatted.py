@@ -5,16 +5,21 @@ Formats CSS files with syntax highlighting and rule analysis.
 """
 
 import argparse
+import gzip
 import os
 import sys
 import traceback
 import html
+import itertools
 import re
 
 def analyze_css(css_content):
     """
     Analyze CSS content for statistics.
     
+    Counts everything in one left-to-right pass that jumps between the
+    characters that matter ({ } : ; @ quotes and comments).
+    
     Args:
         css_content (str): CSS content
     
@@ -30,156 +35,320 @@ def analyze_css(css_content):
         'imports': 0
     }
     
-    # Count rules (selector { ... })
-    stats['rules'] = len(re.findall(r'[^{}]+\{[^{}]*\}', css_content))
-    
-    # Count selectors (rough estimate)
-    stats['selectors'] = len(re.findall(r'[^{}]+(?=\{)', css_content))
-    
-    # Count properties (property: value;)
-    stats['properties'] = len(re.findall(r'[\w-]+\s*:\s*[^;]+;', css_content))
-    
-    # Count media queries
-    stats['media_queries'] = len(re.findall(r'@media[^{]+\{', css_content))
-    
-    # Count comments
-    stats['comments'] = len(re.findall(r'/\*.*?\*/', css_content, re.DOTALL))
-    
-    # Count imports
-    stats['imports'] = len(re.findall(r'@import\s+', css_content))
+    n = len(css_content)
+    i = 0
+    # One entry per open block: whether it contains a nested block
+    has_block = []
+    # A ':' was seen in the current statement inside a block
+    in_declaration = False
+    while True:
+        i = _find_first(_STOP_ANALYZE, css_content, i, n)
+        if i == n:
+            break
+        ch = css_content[i]
+        
+        # Rules (selector { ... }) are the innermost blocks; every block has a selector
+        if ch == '{':
+            stats['selectors'] += 1
+            if has_block:
+                has_block[-1] = True
+            has_block.append(False)
+            in_declaration = False
+        elif ch == '}':
+            if has_block and not has_block.pop():
+                stats['rules'] += 1
+            if in_declaration:
+                stats['properties'] += 1
+            in_declaration = False
+        
+        # Properties (property: value;), the last one's ';' being optional
+        elif ch == ':':
+            in_declaration = bool(has_block)
+        elif ch == ';':
+            if in_declaration:
+                stats['properties'] += 1
+            in_declaration = False
+        
+        # Media queries and imports
+        elif ch == '@':
+            if css_content.startswith('@media', i):
+                stats['media_queries'] += 1
+            elif css_content.startswith('@import', i):
+                stats['imports'] += 1
+        
+        # Comments
+        elif ch == '/':
+            stats['comments'] += 1
+            end = css_content.find('*/', i + 2)
+            i = n if end == -1 else end + 1
+        
+        # Strings may contain any of the above
+        else:
+            end = css_content.find(ch, i + 1)
+            i = n if end == -1 else end
+        i += 1
     
     return stats
 
-def escape_and_highlight_css(css_content):
+# Delimiters each scanner stops at. A character class (plus the '/*' literal) is
+# matched in linear time by re: each search costs the distance to the match,
+# however rare any one delimiter is in the input
+_STOP_ANALYZE = re.compile(r'[;:{}@"\']|/\*')
+_STOP_VALUE = re.compile(r'[;{}("\']')
+_STOP_DECLARATION = re.compile(r'[:;{}]|/\*')
+_STOP_SELECTOR = re.compile(r'[{};]|/\*')
+
+# Length units highlighted after a number in values
+_CSS_UNITS = ('px', 'em', 'rem', '%', 'vh', 'vw', 'pt', 'cm', 'mm', 'in')
+
+# At-rules whose block holds nested rules rather than declarations
+_NESTED_AT_RULES = ('@media', '@supports', '@document', '@-moz-document', '@layer', '@container')
+
+# Longest declaration looked at by the tokenizer's plain 'property: value;' fast path
+_SIMPLE_DECLARATION_MAX = 256
+
+# Hex colors and numbers in a value, as one alternation scanned in a single pass.
+# A whole '#...' or digit run is consumed even when it is not highlighted (too
+# many hex digits, no unit), so no highlight can start in the middle of one.
+_VALUE_TOKEN = re.compile(r'(#[0-9a-fA-F]*)|([0-9][0-9.]*)(' + '|'.join(_CSS_UNITS) + ')?')
+
+# Highlighted tokens joined per write by stream_highlight_css
+_WRITE_BATCH = 4096
+
+# Highlight markup, built once rather than per token
+_SPAN_CLOSE = '</span>'
+_SPAN_OPEN = {kind: f'<span class="css-{kind}">'
+              for kind in ('comment', 'at-rule', 'selector', 'property')}
+_VALUE_OPEN = '<span class="css-value">'
+_COLOR_OPEN = '<span class="css-color">'
+_NUMBER_OPEN = '<span class="css-number">'
+# Closes the number span and wraps the unit that follows it
+_UNIT_SPANS = {unit: f'</span><span class="css-unit">{unit}</span>' for unit in _CSS_UNITS}
+# The single-character brace and semicolon tokens
+_STATIC_SPANS = {
+    '{': '<span class="css-brace">{</span>',
+    '}': '<span class="css-brace">}</span>',
+    ';': '<span class="css-semicolon">;</span>',
+}
+
+
+def _find_first(pattern, content, start, end):
+    """Index of the first match of a _STOP_* pattern in content[start:end], or end."""
+    match = pattern.search(content, start, end)
+    return match.start() if match else end
+
+
+def _skip_value(content, i, n):
+    """Index of the ';', '{' or '}' ending the value at i, skipping (...) and quoted strings."""
+    while True:
+        j = _find_first(_STOP_VALUE, content, i, n)
+        if j == n or content[j] in ';{}':
+            return j
+        close = ')' if content[j] == '(' else content[j]
+        k = content.find(close, j + 1)
+        if k == -1:
+            return n
+        i = k + 1
+
+
+def _tokenize_css(content):
     """
-    Escape HTML and add syntax highlighting to CSS.
+    Split CSS into (kind, text) tokens in a single left-to-right pass.
+    
+    kind is the css-* highlight class, or None for text shown as-is (whitespace,
+    the ':' after a property; never anything that needs escaping). Boundaries are located with str.find, so each
+    character is visited a constant number of times. A stack of open blocks
+    records whether each holds declarations or nested rules (@media etc.).
     
     Args:
-        css_content (str): CSS content
+        content (str): CSS content
     
-    Returns:
-        str: HTML with syntax highlighting
+    Yields:
+        tuple: (kind, text); the texts concatenate back to content
     """
-    lines = css_content.split('\n')
-    highlighted_lines = []
-    in_comment = False
-    
-    for line in lines:
-        if not line.strip():
-            highlighted_lines.append('')
-            continue
-        
-        # Escape HTML first
-        escaped_line = html.escape(line)
-        
-        # Handle multi-line comments
-        if '/*' in escaped_line and '*/' not in escaped_line:
-            in_comment = True
+    n = len(content)
+    i = 0
+    in_decls = []
+    while i < n:
+        ch = content[i]
         
-        if in_comment:
-            escaped_line = f'<span class="css-comment">{escaped_line}</span>'
-            if '*/' in escaped_line:
-                in_comment = False
-            highlighted_lines.append(escaped_line)
-            continue
+        # Whitespace
+        if ch.isspace():
+            j = i + 1
+            while j < n and content[j].isspace():
+                j += 1
+            yield None, content[i:j]
+            i = j
         
-        # Highlight single-line comments
-        escaped_line = re.sub(
-            r'/\*.*?\*/',
-            lambda m: f'<span class="css-comment">{m.group(0)}</span>',
-            escaped_line
-        )
+        # Comments
+        elif content.startswith('/*', i):
+            j = content.find('*/', i + 2)
+            j = n if j == -1 else j + 2
+            yield 'comment', content[i:j]
+            i = j
         
-        # Highlight @-rules (@import, @media, @keyframes, etc.)
-        escaped_line = re.sub(
-            r'(@[\w-]+)',
-            r'<span class="css-at-rule">\1</span>',
-            escaped_line
-        )
+        elif ch == '}':
+            yield 'brace', ch
+            if in_decls:
+                in_decls.pop()
+            i += 1
         
-        # Highlight selectors (before {)
-        escaped_line = re.sub(
-            r'^(\s*)([^{:]+)(\{)',
-            r'\1<span class="css-selector">\2</span><span class="css-brace">\3</span>',
-            escaped_line
-        )
+        elif ch == ';':
+            yield 'semicolon', ch
+            i += 1
         
-        # Highlight closing braces
-        escaped_line = re.sub(
-            r'(\})',
-            r'<span class="css-brace">\1</span>',
-            escaped_line
-        )
+        # @-rules (@import, @media, @keyframes, etc.) and their prelude
+        elif ch == '@':
+            j = i + 1
+            while j < n and (content[j].isalnum() or content[j] in '-_'):
+                j += 1
+            yield 'at-rule', content[i:j]
+            k = _skip_value(content, j, n)
+            if k > j:
+                yield 'prelude', content[j:k]
+            if k < n and content[k] == '{':
+                yield 'brace', '{'
+                in_decls.append(not content.startswith(_NESTED_AT_RULES, i))
+                k += 1
+            i = k
         
-        # Highlight properties (property: value;)
-        escaped_line = re.sub(
-            r'([\w-]+)(\s*:\s*)([^;]+)(;)',
-            r'<span class="css-property">\1</span>\2<span class="css-value">\3</span><span class="css-semicolon">\4</span>',
-            escaped_line
-        )
+        # Declarations (property: value;)
+        elif in_decls and in_decls[-1]:
+            # Fast path for the common plain 'property: value;': one bounded find for
+            # the ';', then substring checks that nothing before it (comment, brace,
+            # string, parenthesis) needs the general scan below
+            k = content.find(';', i, i + _SIMPLE_DECLARATION_MAX)
+            if k != -1:
+                decl = content[i:k]
+                j = decl.find(':')
+                if (j > 0 and '{' not in decl and '}' not in decl and '/' not in decl
+                        and '(' not in decl and '"' not in decl and "'" not in decl):
+                    yield from _declaration_tokens(content, i, i + j, k)
+                    i = k
+                    continue
+            
+            j = _find_first(_STOP_DECLARATION, content, i, n)
+            if j < n and content[j] == ':':
+                k = _skip_value(content, j + 1, n)
+                if k == n or content[k] != '{':
+                    yield from _declaration_tokens(content, i, j, k)
+                    i = k
+                    continue
+                # A ':' before '{' is a nested rule's selector (a:hover {)
+                j = k
+            yield from _selector_tokens(content, i, j, in_decls)
+            i = j + 1 if j < n and content[j] == '{' else j
         
-        # Highlight color values (#hex, rgb, rgba, hsl)
-        escaped_line = re.sub(
-            r'(#[0-9a-fA-F]{3,8})',
-            r'<span class="css-color">\1</span>',
-            escaped_line
-        )
-        
-        # Highlight units (px, em, rem, %, etc.)
-        escaped_line = re.sub(
-            r'(\d+)(px|em|rem|%|vh|vw|pt|cm|mm|in)',
-            r'<span class="css-number">\1</span><span class="css-unit">\2</span>',
-            escaped_line
-        )
-        
-        highlighted_lines.append(escaped_line)
-    
-    return '\n'.join(highlighted_lines)
+        # Selectors (before {)
+        else:
+            j = _find_first(_STOP_SELECTOR, content, i, n)
+            yield from _selector_tokens(content, i, j, in_decls)
+            i = j + 1 if j < n and content[j] == '{' else j
+
+
+def _declaration_tokens(content, i, j, k):
+    """Tokens for the declaration content[i:k] whose property ends at the ':' at j."""
+    name = content[i:j]
+    prop = name.rstrip()
+    yield 'property', prop
+    value = content[j + 1:k]
+    lead = len(value) - len(value.lstrip())
+    yield None, name[len(prop):] + ':' + value[:lead]
+    text = value.rstrip()
+    if len(text) > lead:
+        yield 'value', text[lead:]
+    if len(text) < len(value):
+        yield None, value[max(len(text), lead):]
+
+
+def _selector_tokens(content, i, j, in_decls):
+    """Tokens for the selector content[i:j] and the '{' opening its block at j, if any."""
+    selector = content[i:j]
+    text = selector.rstrip()
+    if text:
+        yield 'selector', text
+    if len(text) < len(selector):
+        yield None, selector[len(text):]
+    if j < len(content) and content[j] == '{':
+        yield 'brace', '{'
+        in_decls.append(True)
+
 
-def convert_css_to_formatted(css_file, output_file, max_size_mb=10):
+def _highlight_value_token(match):
+    """_VALUE_TOKEN.sub() callback: highlight a hex color or a number with a unit."""
+    color = match.group(1)
+    if color is not None:
+        if 4 <= len(color) <= 9:
+            return _COLOR_OPEN + color + _SPAN_CLOSE
+        return color
+    unit = match.group(3)
+    if unit is None:
+        return match.group(2)
+    return _NUMBER_OPEN + match.group(2) + _UNIT_SPANS[unit]
+
+
+def _highlight_value(escaped):
+    """Wrap hex colors and number+unit pairs of an escaped value in highlight spans."""
+    return _VALUE_TOKEN.sub(_highlight_value_token, escaped)
+
+
+def escape_and_highlight_css(css_content):
     """
-    Format CSS with syntax highlighting.
+    Escape HTML and add syntax highlighting to CSS.
     
     Args:
-        css_file (str): Path to input CSS file
-        output_file (str): Path to output HTML file
-        max_size_mb (int): Maximum file size to display in MB (default: 10)
+        css_content (str): CSS content
     
     Returns:
-        bool: True if conversion successful, False otherwise
+        str: HTML with syntax highlighting
     """
-    print(f"Attempting CSS formatting...")
-    print(f"Input: {css_file}")
-    print(f"Output: {output_file}")
-    print(f"Max Size: {max_size_mb} MB")
+    return ''.join(_highlight_parts(css_content))
+
+
+def stream_highlight_css(css_content, f):
+    """
+    Write syntax-highlighted CSS to an open text file as it is produced.
     
-    try:
-        # Check file size
-        file_size = os.path.getsize(css_file)
-        print(f"CSS file size: {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)")
-        
-        # Read CSS file
-        print("Reading CSS file...")
-        with open(css_file, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-        
-        # Analyze CSS
-        print("Analyzing CSS...")
-        stats = analyze_css(content)
-        print(f"CSS analysis: {stats}")
-        
-        # Check if file is too large for formatted display
-        truncated = False
-        if file_size > max_size_mb * 1024 * 1024:
-            truncated = True
-            print(f"WARNING: File is too large ({file_size / 1024 / 1024:.2f} MB), showing limited preview")
-            content = content[:100000]  # First 100KB only
-        
-        # Highlight CSS
-        highlighted_css = escape_and_highlight_css(content)
-        
-        output_parts = []
-        output_parts.append('''<style>
+    Args:
+        css_content (str): CSS content
+        f: Writable text file
+    """
+    # Tokens are joined into batches so the text layer encodes a few large
+    # strings instead of one tiny string per token
+    parts = _highlight_parts(css_content)
+    while True:
+        batch = list(itertools.islice(parts, _WRITE_BATCH))
+        if not batch:
+            break
+        f.write(''.join(batch))
+
+
+def _highlight_parts(css_content):
+    """Yield the escaped, highlighted HTML for each CSS token in order."""
+    escape = html.escape
+    highlight_value = _highlight_value
+    span_open = _SPAN_OPEN
+    static_spans = _STATIC_SPANS
+    for kind, text in _tokenize_css(css_content):
+        if kind is None:
+            # Whitespace and ':' only, nothing to escape
+            yield text
+        elif kind == 'brace' or kind == 'semicolon':
+            yield static_spans[text]
+        elif kind == 'value':
+            yield _VALUE_OPEN + highlight_value(escape(text)) + _SPAN_CLOSE
+        elif kind == 'prelude':
+            yield highlight_value(escape(text))
+        else:
+            yield span_open[kind] + escape(text) + _SPAN_CLOSE
+
+# Stats row under the styles: _STAT_BOX.format(label, value) per statistic
+_STATS_OPEN = '        <div class="css-stats">\n'
+_STAT_BOX = '            <div class="css-stat-box"><div class="css-stat-label">{}</div><div class="css-stat-value">{}</div></div>\n'
+_STATS_CLOSE = '        </div>\n'
+
+# Styles written at the top of every preview page
+_PAGE_STYLE = '''<style>
         .css-stats {
             display: flex;
             gap: 20px;
@@ -288,37 +457,87 @@ def convert_css_to_formatted(css_file, output_file, max_size_mb=10):
             .css-brace { color: #000000; }
             .css-comment { color: #666666; }
         }
-    </style>''')
+    </style>'''
+
+def open_output(path, gzip_output=False):
+    """Open the output page for writing as text, gzip-compressed (level 1) if asked."""
+    if gzip_output:
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=1)
+    return open(path, 'w', encoding='utf-8', buffering=1 << 20)
+
+def convert_css_to_formatted(css_file, output_file, max_size_mb=10, no_highlight_below=0, gzip_output=False):
+    """
+    Format CSS with syntax highlighting.
+    
+    Args:
+        css_file (str): Path to input CSS file
+        output_file (str): Path to output HTML file
+        max_size_mb (int): Maximum file size to display in MB (default: 10)
+        no_highlight_below (int): Show files smaller than this many bytes as plain
+            escaped text without highlighting (default: 0, always highlight)
+        gzip_output (bool): Write the output gzip-compressed (default: False)
+    
+    Returns:
+        bool: True if conversion successful, False otherwise
+    """
+    print(f"Attempting CSS formatting...")
+    print(f"Input: {css_file}")
+    print(f"Output: {output_file}")
+    print(f"Max Size: {max_size_mb} MB")
+    
+    try:
+        # Check file size
+        file_size = os.path.getsize(css_file)
+        print(f"CSS file size: {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)")
         
-        # Add stats with better styling
-        output_parts.append('        <div class="css-stats">\n')
-        output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">File Size</div><div class="css-stat-value">{file_size / 1024:.1f} KB</div></div>\n')
-        output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">Rules</div><div class="css-stat-value">{stats["rules"]}</div></div>\n')
-        output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">Selectors</div><div class="css-stat-value">{stats["selectors"]}</div></div>\n')
-        output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">Properties</div><div class="css-stat-value">{stats["properties"]}</div></div>\n')
+        # Read CSS file
+        print("Reading CSS file...")
+        with open(css_file, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read()
         
-        if stats['media_queries'] > 0:
-            output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">Media Queries</div><div class="css-stat-value">{stats["media_queries"]}</div></div>\n')
+        # Analyze CSS
+        print("Analyzing CSS...")
+        stats = analyze_css(content)
+        print(f"CSS analysis: {stats}")
         
-        if stats['imports'] > 0:
-            output_parts.append(f'            <div class="css-stat-box"><div class="css-stat-label">@imports</div><div class="css-stat-value">{stats["imports"]}</div></div>\n')
+        # Check if file is too large for formatted display
+        truncated = False
+        if file_size > max_size_mb * 1024 * 1024:
+            truncated = True
+            print(f"WARNING: File is too large ({file_size / 1024 / 1024:.2f} MB), showing limited preview")
+            content = content[:100000]  # First 100KB only
         
-        output_parts.append('        </div>\n')
+        # Write the page straight to the output file; the highlighted CSS is
+        # streamed token by token rather than joined into one string first
+        with open_output(output_file, gzip_output) as f:
+            f.write(_PAGE_STYLE)
         
-        # Show warning if truncated
-        if truncated:
-            output_parts.append(f'        <div class="css-warning-banner">⚠️ This CSS file is large ({file_size / 1024 / 1024:.2f} MB). Showing first 100KB only. Download for full content.</div>\n')
+            # Add stats with better styling
+            stat_boxes = [
+                ('File Size', f'{file_size / 1024:.1f} KB'),
+                ('Rules', stats['rules']),
+                ('Selectors', stats['selectors']),
+                ('Properties', stats['properties']),
+            ]
+            if stats['media_queries'] > 0:
+                stat_boxes.append(('Media Queries', stats['media_queries']))
+            if stats['imports'] > 0:
+                stat_boxes.append(('@imports', stats['imports']))
+            f.write(_STATS_OPEN + ''.join(_STAT_BOX.format(label, value) for label, value in stat_boxes) + _STATS_CLOSE)
         
-        # Display CSS content
-        output_parts.append('        <div class="css-container">\n')
-        output_parts.append('            <pre>')
-        output_parts.append(highlighted_css)
-        output_parts.append('</pre>\n')
-        output_parts.append('        </div>\n')
+            # Show warning if truncated
+            if truncated:
+                f.write(f'        <div class="css-warning-banner">⚠️ This CSS file is large ({file_size / 1024 / 1024:.2f} MB). Showing first 100KB only. Download for full content.</div>\n')
         
-        # Write output file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(''.join(output_parts))
+            # Display CSS content
+            f.write('        <div class="css-container">\n')
+            f.write('            <pre>')
+            if file_size < no_highlight_below:
+                f.write(html.escape(content))
+            else:
+                stream_highlight_css(content, f)
+            f.write('</pre>\n')
+            f.write('        </div>\n')
         
         output_size = os.path.getsize(output_file)
         print(f"Formatted CSS file created successfully: {output_size:,} bytes")
@@ -335,6 +554,10 @@ def main():
     parser.add_argument('output_file', help='Output formatted HTML file path')
     parser.add_argument('--max-size-mb', type=int, default=10,
                         help='Maximum file size for formatted display in MB (default: 10)')
+    parser.add_argument('--no-highlight-below', type=int, default=0, metavar='BYTES',
+                        help='Skip syntax highlighting for files smaller than BYTES (default: 0, always highlight)')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Write the output file gzip-compressed (fast level 1)')
     
     args = parser.parse_args()
     
@@ -357,7 +580,9 @@ def main():
     success = convert_css_to_formatted(
         args.css_file,
         args.output_file,
-        max_size_mb=args.max_size_mb
+        max_size_mb=args.max_size_mb,
+        no_highlight_below=args.no_highlight_below,
+        gzip_output=args.gzip
     )
     
     if success:
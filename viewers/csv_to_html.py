@@ -1,40 +1,207 @@
 #!/usr/bin/env python3
 """
-CSV to HTML converter for web preview using Python + pandas.
+CSV to HTML converter for web preview using Python's csv module (or pandas/Polars).
 Converts CSV files to HTML format for browser viewing with table styling.
 """
 
 import argparse
+import gzip
 import os
 import sys
 import traceback
-import pandas as pd
+import html
+import itertools
 import csv
 
-def detect_delimiter(csv_file, sample_size=5):
+# Candidate delimiters; on equal counts the earlier one wins
+_DELIMITERS = (b',', b';', b'\t', b'|')
+
+def detect_delimiter(csv_file, sample_bytes=8192):
     """
     Detect the delimiter used in the CSV file.
     
+    The candidate occurring most often in a sample from the start of the file,
+    outside double-quoted fields, is chosen.
+    
     Args:
         csv_file (str): Path to CSV file
-        sample_size (int): Number of lines to sample
+        sample_bytes (int): Number of bytes to sample from the start
     
     Returns:
         str: Detected delimiter
     """
-    with open(csv_file, 'r', encoding='utf-8', errors='replace') as f:
-        sample = ''.join([f.readline() for _ in range(sample_size)])
+    with open(csv_file, 'rb') as f:
+        sample = f.read(sample_bytes)
     
-    sniffer = csv.Sniffer()
-    try:
-        delimiter = sniffer.sniff(sample).delimiter
-        print(f"Detected delimiter: {repr(delimiter)}")
-        return delimiter
-    except:
+    # Drop a partial last line, which may end inside a quoted field
+    if len(sample) == sample_bytes and b'\n' in sample:
+        sample = sample[:sample.rindex(b'\n') + 1]
+    
+    # Every other '"'-separated piece is inside quotes ("" escapes pair up)
+    unquoted = b''.join(sample.split(b'"')[::2])
+    counts = {d: unquoted.count(d) for d in _DELIMITERS}
+    delimiter = max(counts, key=counts.get)
+    if not counts[delimiter]:
         print("Could not detect delimiter, using comma as default")
         return ','
+    
+    delimiter = delimiter.decode()
+    print(f"Detected delimiter: {repr(delimiter)}")
+    return delimiter
+
+def count_data_rows(csv_file, chunk_size=1 << 20):
+    """
+    Count the data rows of a CSV file (lines after the header) without parsing it.
+    
+    Quoted fields containing newlines are counted as extra rows, so this is an
+    estimate for the truncation banner only.
+    """
+    lines = 0
+    last = b'\n'
+    with open(csv_file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            lines += chunk.count(b'\n')
+            last = chunk[-1:]
+    if last != b'\n':
+        lines += 1
+    return max(lines - 1, 0)
+
+# html.escape()'s replacements, in the order it applies them
+_HTML_ESCAPES = (('&', '&amp;'), ('<', '&lt;'), ('>', '&gt;'), ('"', '&quot;'), ("'", '&#x27;'))
+
+def rows_html(rows):
+    """
+    Yield the <tr> markup for each row of string cells.
+    
+    Args:
+        rows (iterable): Row lists of cell strings
+    """
+    escape = html.escape
+    for row in rows:
+        yield '<tr><td>' + '</td><td>'.join(map(escape, row)) + '</td></tr>\n'
+
+def dataframe_rows_html(df):
+    """
+    Build the <tr> markup for every row of a string DataFrame column by column.
+    
+    The escaping and concatenation run as whole-column string operations
+    (Arrow compute kernels when pyarrow backs the str dtype) instead of a
+    Python call per cell.
+    
+    Args:
+        df (DataFrame): Rows to display, all columns of dtype str
+    
+    Returns:
+        list: One markup string per row
+    """
+    cells = []
+    for col in range(df.shape[1]):
+        series = df.iloc[:, col]
+        for char, entity in _HTML_ESCAPES:
+            series = series.str.replace(char, entity, regex=False)
+        cells.append(series)
+    row = cells[0]
+    for series in cells[1:]:
+        row = row + '</td><td>' + series
+    return ('<tr><td>' + row + '</td></tr>\n').tolist()
+
+def polars_rows_html(df):
+    """
+    Build the <tr> markup for every row of a string Polars DataFrame.
+    
+    Each column is escaped in one pass (replace_many applies every
+    replacement simultaneously, so '&' entities are not escaped twice) and
+    the cells are joined by concat_str, all inside Polars.
+    
+    Args:
+        df (DataFrame): Rows to display, all columns of dtype String
+    
+    Returns:
+        list: One markup string per row
+    """
+    import polars as pl
+    
+    chars = [char for char, _ in _HTML_ESCAPES]
+    entities = [entity for _, entity in _HTML_ESCAPES]
+    cells = pl.concat_str(pl.all().str.replace_many(chars, entities), separator='</td><td>')
+    row = pl.concat_str([pl.lit('<tr><td>'), cells, pl.lit('</td></tr>\n')])
+    return df.select(row.alias('row'))['row'].to_list()
+
+def write_table_html(columns, rows_html, f):
+    """
+    Write the preview's HTML table, one row at a time.
+    
+    Args:
+        columns (list): Column names
+        rows_html (iterable): <tr> markup for each row
+        f: Writable text file
+    """
+    f.write('<table border="0" class="dataframe data-table" id="csv-data-table">\n')
+    header = ''.join(f'<th>{html.escape(str(c))}</th>' for c in columns)
+    f.write(f'<thead><tr>{header}</tr></thead>\n<tbody>\n')
+    f.writelines(rows_html)
+    f.write('</tbody>\n</table>')
+
+def convert_csv_to_html(csv_file, html_file, max_rows=2000, gzip_output=False):
+    """
+    Convert CSV to HTML with the csv module, reading only the rows displayed.
+    
+    Args:
+        csv_file (str): Path to input CSV file
+        html_file (str): Path to output HTML file
+        max_rows (int): Maximum rows to display (default: 2000)
+        gzip_output (bool): Write the output gzip-compressed (default: False)
+    
+    Returns:
+        bool: True if conversion successful, False otherwise
+    """
+    print("Attempting CSV to HTML conversion...")
+    print(f"Input: {csv_file}")
+    print(f"Output: {html_file}")
+    print(f"Max Rows: {max_rows}")
+    
+    try:
+        # Detect delimiter
+        delimiter = detect_delimiter(csv_file)
+        
+        # Read the header and at most max_rows + 1 rows (the extra one detects
+        # truncation). Like pandas' on_bad_lines='skip', blank lines and rows with
+        # more fields than the header are skipped and short rows are padded.
+        print("Reading CSV file...")
+        with open(csv_file, 'r', newline='', encoding='utf-8', errors='replace') as f:
+            reader = csv.reader(f, delimiter=delimiter)
+            columns = next(reader, [])
+            cols = len(columns)
+            data = list(itertools.islice((r for r in reader if r and len(r) <= cols), max_rows + 1))
+        for row in data:
+            if len(row) < cols:
+                row.extend([''] * (cols - len(row)))
+        
+        # Check if CSV is empty
+        if not data:
+            print("WARNING: CSV file is empty")
+        
+        # Truncate if too many rows; the total is then estimated from the line count
+        rows = len(data)
+        truncated = False
+        if rows > max_rows:
+            truncated = True
+            del data[max_rows:]
+            rows = count_data_rows(csv_file)
+        print(f"CSV has {rows:,} rows and {cols} columns")
+        
+        write_preview_html(html_file, columns, rows_html(data), rows, truncated, max_rows, gzip_output)
+        
+        file_size = os.path.getsize(html_file)
+        print(f"HTML file created successfully: {file_size} bytes")
+        return True
+        
+    except Exception as e:
+        print(f"ERROR: CSV conversion error: {e}")
+        traceback.print_exc()
+        return False
 
-def convert_csv_to_html_pandas(csv_file, html_file, max_rows=2000):
+def convert_csv_to_html_pandas(csv_file, html_file, max_rows=2000, gzip_output=False):
     """
     Convert CSV to HTML using pandas with table styling.
     
@@ -42,6 +209,7 @@ def convert_csv_to_html_pandas(csv_file, html_file, max_rows=2000):
         csv_file (str): Path to input CSV file
         html_file (str): Path to output HTML file
         max_rows (int): Maximum rows to display (default: 2000)
+        gzip_output (bool): Write the output gzip-compressed (default: False)
     
     Returns:
         bool: True if conversion successful, False otherwise
@@ -52,29 +220,141 @@ def convert_csv_to_html_pandas(csv_file, html_file, max_rows=2000):
     print(f"Max Rows: {max_rows}")
     
     try:
+        import pandas as pd
+        
         # Detect delimiter
         delimiter = detect_delimiter(csv_file)
         
-        # Read CSV file
+        # Read CSV file. Only the rows that will be shown (plus one, to detect
+        # truncation) are parsed, and as plain strings since they are only displayed
         print("Reading CSV file with pandas...")
-        df = pd.read_csv(csv_file, sep=delimiter, encoding='utf-8', on_bad_lines='skip')
+        df = pd.read_csv(csv_file, sep=delimiter, encoding='utf-8', on_bad_lines='skip',
+                         dtype=str, keep_default_na=False, na_filter=False,
+                         nrows=max_rows + 1, engine='c')
+        
+        # Get stats
+        rows, cols = df.shape
         
         # Check if CSV is empty
-        if df.empty:
+        if rows == 0:
             print("WARNING: CSV file is empty")
         
-        # Get stats
-        rows, cols = df.shape
+        # Truncate if too many rows; the total is then estimated from the line count
+        truncated = False
+        if rows > max_rows:
+            truncated = True
+            df = df.iloc[:max_rows]
+            rows = count_data_rows(csv_file)
         print(f"CSV has {rows:,} rows and {cols} columns")
         
-        # Truncate if too many rows
+        # No rows, nothing to render
+        data = dataframe_rows_html(df) if rows > 0 and cols > 0 else []
+        write_preview_html(html_file, df.columns, data, rows, truncated, max_rows, gzip_output)
+        
+        file_size = os.path.getsize(html_file)
+        print(f"HTML file created successfully: {file_size} bytes")
+        return True
+        
+    except Exception as e:
+        print(f"ERROR: Pandas conversion error: {e}")
+        traceback.print_exc()
+        return False
+
+def convert_csv_to_html_polars(csv_file, html_file, max_rows=2000, gzip_output=False):
+    """
+    Convert CSV to HTML using a lazy Polars scan of just the rows displayed.
+    
+    Falls back to the pandas converter if Polars is not installed or cannot
+    parse the file.
+    
+    Args:
+        csv_file (str): Path to input CSV file
+        html_file (str): Path to output HTML file
+        max_rows (int): Maximum rows to display (default: 2000)
+        gzip_output (bool): Write the output gzip-compressed (default: False)
+    
+    Returns:
+        bool: True if conversion successful, False otherwise
+    """
+    print("Attempting CSV to HTML conversion with polars...")
+    print(f"Input: {csv_file}")
+    print(f"Output: {html_file}")
+    print(f"Max Rows: {max_rows}")
+    
+    try:
+        import polars as pl
+    except ImportError as e:
+        print(f"WARNING: Polars not available ({e}), falling back to pandas")
+        return convert_csv_to_html_pandas(csv_file, html_file, max_rows=max_rows, gzip_output=gzip_output)
+    
+    try:
+        # Detect delimiter
+        delimiter = detect_delimiter(csv_file)
+        
+        # Header names first (duplicates get polars' _duplicated_N suffixes)
+        columns = pl.scan_csv(csv_file, separator=delimiter, infer_schema=False, n_rows=0,
+                              encoding='utf8-lossy').collect_schema().names()
+        
+        # Scan lazily and collect at most max_rows + 1 rows (the extra one detects
+        # truncation); the head is pushed into the scan so the rest of the file is
+        # never parsed. Every column is read as a string since cells are only
+        # displayed. Like the csv and pandas engines, blank lines (all-null rows)
+        # and rows with more fields than the header are skipped and short rows are
+        # padded: one extra sentinel column is scanned, and a row that puts a value
+        # in it is too long. polars reads an empty field as null, so a row whose
+        # only surplus is an empty trailing field ("1,2,3," under a 3-column
+        # header) cannot be told apart and is kept.
+        print("Reading CSV file with polars...")
+        extra = '__extra__'
+        while extra in columns:
+            extra = f'_{extra}_'
+        lf = pl.scan_csv(csv_file, separator=delimiter, has_header=False, skip_rows=1,
+                         schema={name: pl.String for name in columns + [extra]},
+                         missing_columns='insert', truncate_ragged_lines=True,
+                         encoding='utf8-lossy')
+        df = (lf.filter(pl.col(extra).is_null() & ~pl.all_horizontal(pl.exclude(extra).is_null()))
+                .drop(extra)
+                .head(max_rows + 1)
+                .collect()
+                .fill_null(''))
+        
+        # Get stats
+        rows = df.height
+        cols = len(columns)
+        
+        # Check if CSV is empty
+        if rows == 0:
+            print("WARNING: CSV file is empty")
+        
+        # Truncate if too many rows; the total is then estimated from the line
+        # count, as in the other engines
         truncated = False
         if rows > max_rows:
             truncated = True
             df = df.head(max_rows)
+            rows = count_data_rows(csv_file)
+        print(f"CSV has {rows:,} rows and {cols} columns")
+        
+        # No rows, nothing to render
+        data = polars_rows_html(df) if rows > 0 and cols > 0 else []
+        write_preview_html(html_file, df.columns, data, rows, truncated, max_rows, gzip_output)
+        
+        file_size = os.path.getsize(html_file)
+        print(f"HTML file created successfully: {file_size} bytes")
+        return True
         
-        html_parts = []
-        html_parts.append('''<style>
+    except Exception as e:
+        print(f"ERROR: Polars conversion error: {e}, falling back to pandas")
+        traceback.print_exc()
+        return convert_csv_to_html_pandas(csv_file, html_file, max_rows=max_rows, gzip_output=gzip_output)
+
+# Stats row under the styles: _STAT_BOX.format(label, value) per statistic
+_STATS_OPEN = '        <div class="csv-stats">\n'
+_STAT_BOX = '            <div class="csv-stat-box"><div class="csv-stat-label">{}</div><div class="csv-stat-value">{}</div></div>\n'
+_STATS_CLOSE = '        </div>\n'
+
+# Styles written at the top of every preview page
+_PAGE_STYLE = '''<style>
         .csv-stats {
             display: flex;
             gap: 20px;
@@ -153,48 +433,45 @@ def convert_csv_to_html_pandas(csv_file, html_file, max_rows=2000):
             background: #f9fafb;
             border-radius: 8px;
         }
-    </style>''')
-        
-        # Add stats with better styling
-        html_parts.append('        <div class="csv-stats">\n')
-        html_parts.append(f'            <div class="csv-stat-box"><div class="csv-stat-label">Rows</div><div class="csv-stat-value">{rows:,}</div></div>\n')
-        html_parts.append(f'            <div class="csv-stat-box"><div class="csv-stat-label">Columns</div><div class="csv-stat-value">{cols}</div></div>\n')
-        html_parts.append('        </div>\n')
-        
-        # Show warning if truncated
-        if truncated:
-            html_parts.append(f'        <div class="csv-warning-banner">⚠️ This CSV file has {rows:,} rows. Showing first {max_rows:,} rows only. Download the file for full content.</div>\n')
-        
+    </style>'''
+
+def open_output(path, gzip_output=False):
+    """Open the output page for writing as text, gzip-compressed (level 1) if asked."""
+    if gzip_output:
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=1)
+    return open(path, 'w', encoding='utf-8', buffering=1 << 20)
+
+def write_preview_html(html_file, columns, data, rows, truncated, max_rows, gzip_output=False):
+    """
+    Write the preview page: styles, stats, truncation banner and data table.
+    
+    Args:
+        html_file (str): Path to output HTML file
+        columns (list): Column names
+        data (iterable): <tr> markup for each row displayed
+        rows (int): Total number of data rows in the CSV
+        truncated (bool): Whether only the first max_rows rows are shown
+        max_rows (int): Maximum rows displayed
+        gzip_output (bool): Write the output gzip-compressed (default: False)
+    """
+    cols = len(columns)
+    stats = _STATS_OPEN + _STAT_BOX.format('Rows', f'{rows:,}') + _STAT_BOX.format('Columns', cols) + _STATS_CLOSE
+    
+    # Show warning if truncated
+    warning_html = ''
+    if truncated:
+        warning_html = f'        <div class="csv-warning-banner">⚠️ This CSV file has {rows:,} rows. Showing first {max_rows:,} rows only. Download the file for full content.</div>\n'
+    
+    # Write the page straight to the output file: everything above the table in
+    # one write, then the table streamed row by row
+    with open_output(html_file, gzip_output) as f:
         # Check if empty
-        if df.empty:
-            html_parts.append('        <div class="csv-empty">This CSV file is empty</div>\n')
+        if not rows:
+            f.write(f'{_PAGE_STYLE}{stats}{warning_html}        <div class="csv-empty">This CSV file is empty</div>\n')
         else:
-            # Convert DataFrame to HTML table
-            table_html = df.to_html(
-                index=False,
-                na_rep='',
-                border=0,
-                classes='data-table',
-                escape=True,
-                table_id='csv-data-table'
-            )
-            
-            html_parts.append('        <div class="csv-table-wrapper">\n')
-            html_parts.append('        ' + table_html + '\n')
-            html_parts.append('        </div>\n')
-        
-        # Write HTML file
-        with open(html_file, 'w', encoding='utf-8') as f:
-            f.write(''.join(html_parts))
-        
-        file_size = os.path.getsize(html_file)
-        print(f"HTML file created successfully: {file_size} bytes")
-        return True
-        
-    except Exception as e:
-        print(f"ERROR: Pandas conversion error: {e}")
-        traceback.print_exc()
-        return False
+            f.write(f'{_PAGE_STYLE}{stats}{warning_html}        <div class="csv-table-wrapper">\n        ')
+            write_table_html(columns, data, f)
+            f.write('\n        </div>\n')
 
 def main():
     parser = argparse.ArgumentParser(description='Convert CSV to HTML for web preview')
@@ -202,6 +479,12 @@ def main():
     parser.add_argument('html_file', help='Output HTML file path')
     parser.add_argument('--max-rows', type=int, default=2000,
                         help='Maximum rows to display (default: 2000)')
+    parser.add_argument('--engine', choices=['csv', 'pandas', 'polars'], default='csv',
+                        help='CSV reader to use (default: csv, the standard library module). All skip blank lines and '
+                             'rows with more fields than the header, except that polars keeps a row whose '
+                             'only extra field is an empty trailing one')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Write the output file gzip-compressed (fast level 1)')
     
     args = parser.parse_args()
     
@@ -215,14 +498,22 @@ def main():
         print(f"ERROR: Input CSV file not found: {args.csv_file}")
         sys.exit(1)
     
-    # Check required libraries
-    try:
-        import pandas
-        print(f"Pandas version: {pandas.__version__}")
-    except ImportError as e:
-        print(f"ERROR: Pandas not available: {e}")
-        print("Please install: pip install pandas")
-        sys.exit(1)
+    # Check required libraries (pandas is only imported for --engine pandas, or
+    # polars as its fallback; importing it costs more than parsing a typical preview)
+    if args.engine == 'polars':
+        try:
+            import polars
+            print(f"Polars version: {polars.__version__}")
+        except ImportError as e:
+            print(f"WARNING: Polars not available: {e}")
+    if args.engine in ('pandas', 'polars'):
+        try:
+            import pandas
+            print(f"Pandas version: {pandas.__version__}")
+        except ImportError as e:
+            print(f"ERROR: Pandas not available: {e}")
+            print("Please install: pip install pandas")
+            sys.exit(1)
     
     # Create output directory if it doesn't exist
     output_dir = os.path.dirname(args.html_file)
@@ -230,10 +521,16 @@ def main():
         os.makedirs(output_dir)
     
     # Convert CSV to HTML
-    success = convert_csv_to_html_pandas(
+    convert = {
+        'csv': convert_csv_to_html,
+        'pandas': convert_csv_to_html_pandas,
+        'polars': convert_csv_to_html_polars,
+    }[args.engine]
+    success = convert(
         args.csv_file,
         args.html_file,
-        max_rows=args.max_rows
+        max_rows=args.max_rows,
+        gzip_output=args.gzip
     )
     
     if success:
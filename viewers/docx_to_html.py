@@ -5,11 +5,243 @@ Converts DOCX files to HTML format for browser viewing.
 """
 
 import argparse
+import fcntl
+import hashlib
 import os
 import sys
+import shutil
+import signal
 import subprocess
+import tempfile
 import traceback
 
+# LibreOffice profile initialized once at image build; each conversion starts
+# from a copy instead of paying first-run profile setup or sharing a locked one
+PROFILE_TEMPLATE = os.environ.get('LIBREOFFICE_PROFILE_TEMPLATE', '/opt/libreoffice_profile')
+# Shared profile used when no template is available
+SHARED_PROFILE_DIR = '/tmp/libreoffice_user_profile'
+
+# Persistent headless LibreOffice that conversions are handed to over UNO, so
+# each preview does not pay LibreOffice's multi-second startup. It runs as a
+# supervised service (--serve-listener, started by the server) and accepts on a
+# local named pipe, not a TCP port. DOCX_LISTENER_NAME gives each worker its own.
+LISTENER_NAME = os.environ.get('DOCX_LISTENER_NAME', f'docx_preview_{os.getuid()}')
+LISTENER_CONNECTION = f'pipe,name={LISTENER_NAME};urp;StarOffice.ComponentContext'
+# Own profile: a profile cannot be shared with the one-shot conversions below
+LISTENER_PROFILE_DIR = os.path.join(tempfile.gettempdir(), f'{LISTENER_NAME}_profile')
+# Held exclusively by the serving process while its LibreOffice runs
+LISTENER_LOCK_FILE = os.path.join(tempfile.gettempdir(), f'{LISTENER_NAME}.lock')
+# How long LibreOffice gets to exit after SIGTERM before it is killed
+LISTENER_STOP_TIMEOUT = 10
+
+# Converted previews keyed by a hash of the DOCX bytes, so a document that is
+# previewed again is copied from here instead of being converted again
+CACHE_DIR = os.environ.get('DOCX_PREVIEW_CACHE_DIR', '/tmp/docx_preview_cache')
+# Least recently used entries beyond this many are deleted
+CACHE_MAX_ENTRIES = 256
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the hex BLAKE2b-128 digest of a file's contents."""
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def load_cached_html(key, html_file):
+    """
+    Copy a cached preview to html_file if there is one.
+    
+    Returns:
+        bool: True on a cache hit
+    """
+    cached = os.path.join(CACHE_DIR, f'{key}.html')
+    try:
+        shutil.copyfile(cached, html_file)
+        os.utime(cached)  # mark as recently used
+    except OSError:
+        return False
+    print(f"Using cached preview: {cached}")
+    return True
+
+def store_cached_html(key, html_file):
+    """Add a converted preview to the cache and evict the least recently used."""
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # Copy under a temporary name and rename, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=CACHE_DIR, suffix='.tmp')
+        os.close(fd)
+        shutil.copyfile(html_file, tmp_path)
+        os.replace(tmp_path, os.path.join(CACHE_DIR, f'{key}.html'))
+        
+        entries = [e for e in os.scandir(CACHE_DIR) if e.name.endswith('.html')]
+        if len(entries) > CACHE_MAX_ENTRIES:
+            entries.sort(key=lambda e: e.stat().st_mtime)
+            for entry in entries[:len(entries) - CACHE_MAX_ENTRIES]:
+                os.remove(entry.path)
+    except OSError as e:
+        print(f"WARNING: Could not cache preview: {e}")
+
+def copy_profile_template(profile_dir):
+    """
+    Fill profile_dir with a copy of the pre-initialized profile template.
+    
+    Returns:
+        bool: True if the template exists and was copied
+    """
+    if not os.path.isdir(PROFILE_TEMPLATE):
+        return False
+    shutil.copytree(PROFILE_TEMPLATE, profile_dir, dirs_exist_ok=True)
+    return True
+
+def office_listener_running():
+    """Check whether a --serve-listener process holds the listener lock."""
+    try:
+        fd = os.open(LISTENER_LOCK_FILE, os.O_RDONLY)
+    except OSError:
+        return False
+    try:
+        fcntl.flock(fd, fcntl.LOCK_SH | fcntl.LOCK_NB)
+    except BlockingIOError:
+        return True
+    finally:
+        os.close(fd)
+    return False
+
+def serve_office_listener():
+    """
+    Run a headless LibreOffice listening for UNO connections until it exits or
+    this process is stopped.
+    
+    Meant to run under a supervisor that restarts it (the server does). The
+    listener lock is held for LibreOffice's lifetime, so only one listener per
+    name starts; LibreOffice is stopped on SIGTERM/SIGINT and when this returns.
+    
+    Returns:
+        int: LibreOffice's exit code, or 1 if it could not be started
+    """
+    lock_fd = os.open(LISTENER_LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600)
+    try:
+        fcntl.flock(lock_fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+        print(f"ERROR: LibreOffice listener {LISTENER_NAME} is already running")
+        os.close(lock_fd)
+        return 1
+    
+    env = os.environ.copy()
+    env['SAL_USE_VCLPLUGIN'] = 'svp'
+    env['HOME'] = os.path.expanduser('~')
+    
+    if not os.path.isdir(LISTENER_PROFILE_DIR):
+        copy_profile_template(LISTENER_PROFILE_DIR)
+    
+    cmd = [
+        'libreoffice',
+        '--headless',
+        '--invisible',
+        '--nocrashreport',
+        '--nodefault',
+        '--nofirststartwizard',
+        '--nologo',
+        '--norestore',
+        f'-env:UserInstallation=file://{LISTENER_PROFILE_DIR}',
+        f'--accept={LISTENER_CONNECTION}',
+    ]
+    print(f"Starting LibreOffice listener: {' '.join(cmd)}")
+    try:
+        # Own process group: the launcher forks soffice.bin, and stopping the
+        # group stops both
+        office = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, env=env, start_new_session=True)
+    except FileNotFoundError:
+        print("ERROR: LibreOffice not found")
+        os.close(lock_fd)
+        return 1
+    
+    stopping = []
+    
+    def stop_office(signum=None, frame=None):
+        stopping.append(signum)
+        try:
+            os.killpg(office.pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    
+    signal.signal(signal.SIGTERM, stop_office)
+    signal.signal(signal.SIGINT, stop_office)
+    try:
+        returncode = office.wait()
+        # Stopped on request is a clean exit, not a LibreOffice failure
+        return 0 if stopping else returncode
+    finally:
+        stop_office()
+        try:
+            office.wait(timeout=LISTENER_STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            os.killpg(office.pid, signal.SIGKILL)
+        os.close(lock_fd)
+        print("LibreOffice listener stopped")
+
+def convert_docx_to_html_listener(docx_file, html_file):
+    """
+    Convert DOCX to HTML through a running LibreOffice listener with unoconv.
+    
+    Only used while a listener is being served (see serve_office_listener);
+    this never starts one. unoconv runs under the system Python, which has the
+    uno module this script's environment lacks.
+    
+    Args:
+        docx_file (str): Path to input DOCX file
+        html_file (str): Path to output HTML file
+    
+    Returns:
+        bool: True if conversion successful, False otherwise
+    """
+    print("Attempting DOCX to HTML conversion with the LibreOffice listener...")
+    print(f"Input: {docx_file}")
+    print(f"Output: {html_file}")
+    
+    try:
+        if not office_listener_running():
+            print("LibreOffice listener is not running")
+            return False
+        
+        # --no-launch: fail rather than start a one-off office if the listener is gone
+        cmd = [
+            'unoconv',
+            '--connection', LISTENER_CONNECTION,
+            '--no-launch',
+            '-f', 'html',
+            '-o', html_file,
+            docx_file
+        ]
+        
+        print(f"Running command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        
+        if result.stdout:
+            print(f"unoconv stdout: {result.stdout}")
+        if result.stderr:
+            print(f"unoconv stderr: {result.stderr}")
+        
+        if result.returncode == 0 and os.path.exists(html_file):
+            file_size = os.path.getsize(html_file)
+            print(f"HTML file created successfully: {file_size} bytes")
+            return True
+        else:
+            print(f"ERROR: unoconv conversion failed (exit code {result.returncode})")
+            return False
+        
+    except subprocess.TimeoutExpired:
+        print("ERROR: unoconv conversion timed out (>120s)")
+        return False
+    except FileNotFoundError:
+        print("ERROR: LibreOffice or unoconv not found")
+        return False
+    except Exception as e:
+        print(f"ERROR: LibreOffice listener conversion error: {e}")
+        traceback.print_exc()
+        return False
+
 def convert_docx_to_html_libreoffice(docx_file, html_file):
     """
     Convert DOCX to HTML using LibreOffice.
@@ -25,6 +257,7 @@ def convert_docx_to_html_libreoffice(docx_file, html_file):
     print(f"Input: {docx_file}")
     print(f"Output: {html_file}")
     
+    profile_dir = None
     try:
         # Get output directory
         output_dir = os.path.dirname(html_file)
@@ -34,6 +267,13 @@ def convert_docx_to_html_libreoffice(docx_file, html_file):
         env['SAL_USE_VCLPLUGIN'] = 'svp'
         env['HOME'] = os.path.expanduser('~')
         
+        # A private copy of the warm profile, so concurrent conversions do not
+        # contend for one profile; the shared one is the fallback
+        profile_dir = tempfile.mkdtemp(prefix='lo_profile_')
+        if not copy_profile_template(profile_dir):
+            shutil.rmtree(profile_dir, ignore_errors=True)
+            profile_dir = None
+        
         # LibreOffice conversion command
         cmd = [
             'libreoffice',
@@ -45,7 +285,7 @@ def convert_docx_to_html_libreoffice(docx_file, html_file):
             '--nolockcheck',
             '--nologo',
             '--norestore',
-            '-env:UserInstallation=file:///tmp/libreoffice_user_profile',
+            f'-env:UserInstallation=file://{profile_dir or SHARED_PROFILE_DIR}',
             '--convert-to', 'html',
             '--outdir', output_dir,
             docx_file
@@ -91,6 +331,9 @@ def convert_docx_to_html_libreoffice(docx_file, html_file):
         print(f"ERROR: LibreOffice conversion error: {e}")
         traceback.print_exc()
         return False
+    finally:
+        if profile_dir:
+            shutil.rmtree(profile_dir, ignore_errors=True)
 
 def convert_docx_to_html_pandoc(docx_file, html_file):
     """
@@ -118,13 +361,15 @@ def convert_docx_to_html_pandoc(docx_file, html_file):
             print("WARNING: Pandoc not found")
             return False
         
-        # Convert DOCX to HTML using pandoc
+        # Convert DOCX to an HTML fragment using pandoc; the server keeps only
+        # the <body> contents, so the standalone template is not rendered
         cmd = [
             'pandoc',
             docx_file,
             '-f', 'docx',
-            '-t', 'html',
-            '--standalone',
+            '-t', 'html5',
+            '--wrap=none',
+            '--quiet',
             '-o', html_file
         ]
         
@@ -166,10 +411,20 @@ def convert_docx_to_html_pandoc(docx_file, html_file):
 
 def main():
     parser = argparse.ArgumentParser(description='Convert DOCX to HTML for web preview')
-    parser.add_argument('docx_file', help='Input DOCX file path')
-    parser.add_argument('html_file', help='Output HTML file path')
+    parser.add_argument('docx_file', nargs='?', help='Input DOCX file path')
+    parser.add_argument('html_file', nargs='?', help='Output HTML file path')
+    parser.add_argument('--no-listener', action='store_true',
+                        help='Do not use the persistent LibreOffice listener')
+    parser.add_argument('--serve-listener', action='store_true',
+                        help='Run the persistent LibreOffice listener in the foreground (for a supervisor) instead of converting')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Always convert, without reading or updating the preview cache')
     
     args = parser.parse_args()
+    if args.serve_listener:
+        sys.exit(serve_office_listener())
+    if not (args.docx_file and args.html_file):
+        parser.error('docx_file and html_file are required unless --serve-listener is given')
     
     print("=== DOCX to HTML Converter ===")
     print(f"Python version: {sys.version}")
@@ -181,18 +436,35 @@ def main():
         print(f"ERROR: Input DOCX file not found: {args.docx_file}")
         sys.exit(1)
     
+    # Reuse the preview of an identical document converted earlier
+    cache_key = None
+    if not args.no_cache:
+        cache_key = file_digest(args.docx_file)
+        if load_cached_html(cache_key, args.html_file):
+            print("=== CONVERSION SUCCESSFUL ===")
+            sys.exit(0)
+    
     # Try conversion methods in order of preference
     success = False
     
-    # 1. Try LibreOffice first (best for DOCX files)
-    success = convert_docx_to_html_libreoffice(args.docx_file, args.html_file)
+    # 1. Try the persistent LibreOffice listener (no per-call startup)
+    if not args.no_listener:
+        success = convert_docx_to_html_listener(args.docx_file, args.html_file)
+    
+    # 2. Try a one-shot LibreOffice (best for DOCX files)
+    if not success:
+        if not args.no_listener:
+            print("\nTrying one-shot LibreOffice conversion...")
+        success = convert_docx_to_html_libreoffice(args.docx_file, args.html_file)
     
-    # 2. Try Pandoc if LibreOffice failed
+    # 3. Try Pandoc if LibreOffice failed
     if not success:
         print("\nTrying Pandoc conversion...")
         success = convert_docx_to_html_pandoc(args.docx_file, args.html_file)
     
     if success:
+        if cache_key:
+            store_cached_html(cache_key, args.html_file)
         print("=== CONVERSION SUCCESSFUL ===")
         sys.exit(0)
     else:
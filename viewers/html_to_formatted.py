@@ -5,12 +5,33 @@ Formats HTML files with syntax highlighting and validation.
 """
 
 import argparse
+import gzip
 import os
 import sys
 import traceback
 import html as html_module
+import re
 from html.parser import HTMLParser
 
+try:
+    from lxml import etree
+    HAS_LXML = True
+except ImportError:
+    HAS_LXML = False
+
+# Highlighting patterns, compiled once. They run over the whole escaped document,
+# so each is kept from matching across a newline: highlighting stays per line.
+_BLANK_LINE_RE = re.compile(r'^[^\S\n]+$', re.MULTILINE)
+# A line holding a DOCTYPE or a comment opener, highlighted by _highlight_markup_line
+_MARKUP_LINE_RE = re.compile(r'^.*&lt;!(?:DOCTYPE|doctype|--).*$', re.MULTILINE)
+_DOCTYPE_RE = re.compile(r'&lt;!(DOCTYPE|doctype)')
+# Opening tag "<tagname" (groups 1-2) or closing bracket ">" (group 3), in one scan
+_TAG_RE = re.compile(r'&lt;(/?)(\w+)|(/?&gt;)')
+_ATTR_DQ_RE = re.compile(r'([\w\-]+)=&quot;([^&quot;\n]*)&quot;')
+
+# Characters of input highlighted per chunk when streaming to a file
+_STREAM_CHUNK = 1 << 16
+
 class HTMLElementCounter(HTMLParser):
     """Count HTML elements and extract statistics."""
     
@@ -32,121 +53,119 @@ class HTMLElementCounter(HTMLParser):
         if 'doctype' in decl.lower():
             self.has_doctype = True
 
+class LxmlElementCounter:
+    """
+    Count HTML elements with libxml2's HTML parser (same API as HTMLElementCounter).
+    
+    Tags are counted from the parser's target callbacks without building a
+    tree. Unlike html.parser, libxml2 adds the <html> and <body> elements a
+    fragment implies and merges repeated ones.
+    """
+    
+    def __init__(self):
+        self.element_count = 0
+        self.tag_counts = {}
+        self.has_doctype = False
+        self._parser = etree.HTMLParser(target=_CountingTarget(self))
+    
+    def feed(self, data):
+        self._parser.feed(data)
+    
+    def close(self):
+        self._parser.close()
+
+class _CountingTarget:
+    """lxml parser target that records tags and the DOCTYPE on a LxmlElementCounter."""
+    
+    def __init__(self, counter):
+        self.counter = counter
+    
+    def start(self, tag, attrib):
+        counter = self.counter
+        counter.element_count += 1
+        counter.tag_counts[tag] = counter.tag_counts.get(tag, 0) + 1
+    
+    def doctype(self, name, pubid, system):
+        self.counter.has_doctype = True
+    
+    def close(self):
+        return None
+
+def _highlight_markup_line(match):
+    """Wrap the DOCTYPE and comments of one escaped line in highlight spans."""
+    line = match.group()
+    
+    # Highlight DOCTYPE
+    line, doctypes = _DOCTYPE_RE.subn(r'<span class="html-doctype">&lt;!\1', line)
+    if doctypes:
+        line = line.replace('&gt;', '&gt;</span>')
+    
+    # Highlight comments
+    if '&lt;!--' in line:
+        line = line.replace('&lt;!--', '<span class="html-comment">&lt;!--')
+        line = line.replace('--&gt;', '--&gt;</span>')
+    
+    return line
+
+def _highlight_tag(match):
+    """Wrap an escaped '<tagname' or '>' in bracket and tag-name spans."""
+    tag = match[2]
+    if tag is None:
+        return '<span class="html-bracket">' + match[3] + '</span>'
+    return '<span class="html-bracket">&lt;' + match[1] + '</span><span class="html-tag">' + tag + '</span>'
+
 def escape_and_highlight_html(html_content):
     """
     Escape HTML and add syntax highlighting.
     
+    Each pass runs over the whole document at once rather than line by line.
+    
     Args:
         html_content (str): HTML content
     
     Returns:
         str: HTML with syntax highlighting
     """
-    lines = html_content.split('\n')
-    highlighted_lines = []
+    # Escape HTML first, and empty the whitespace-only lines
+    escaped = html_module.escape(html_content)
+    escaped = _BLANK_LINE_RE.sub('', escaped)
     
-    for line in lines:
-        if not line.strip():
-            highlighted_lines.append('')
-            continue
-        
-        # Escape HTML first
-        escaped_line = html_module.escape(line)
-        
-        # Highlight DOCTYPE
-        if '&lt;!DOCTYPE' in escaped_line or '&lt;!doctype' in escaped_line:
-            escaped_line = escaped_line.replace('&lt;!DOCTYPE', '<span class="html-doctype">&lt;!DOCTYPE')
-            escaped_line = escaped_line.replace('&lt;!doctype', '<span class="html-doctype">&lt;!doctype')
-            escaped_line = escaped_line.replace('&gt;', '&gt;</span>')
-        
-        # Highlight comments
-        if '&lt;!--' in escaped_line:
-            escaped_line = escaped_line.replace('&lt;!--', '<span class="html-comment">&lt;!--')
-            escaped_line = escaped_line.replace('--&gt;', '--&gt;</span>')
-        
-        # Highlight tags
-        import re
-        # Opening tags: <tagname
-        escaped_line = re.sub(
-            r'&lt;(/?)(\w+)',
-            r'<span class="html-bracket">&lt;\1</span><span class="html-tag">\2</span>',
-            escaped_line
-        )
-        # Closing brackets: >
-        escaped_line = re.sub(
-            r'(/?)&gt;',
-            r'<span class="html-bracket">\1&gt;</span>',
-            escaped_line
-        )
-        
-        # Highlight attribute values
-        escaped_line = re.sub(
-            r'([\w\-]+)=&quot;([^&quot;]*)&quot;',
-            r'<span class="html-attr-name">\1</span>=<span class="html-attr-value">&quot;\2&quot;</span>',
-            escaped_line
-        )
-        escaped_line = re.sub(
-            r"([\w\-]+)='([^']*)'",
-            r'<span class="html-attr-name">\1</span>=<span class="html-attr-value">\'\2\'</span>',
-            escaped_line
-        )
-        
-        highlighted_lines.append(escaped_line)
+    # Highlight DOCTYPE and comments, on the lines that have them
+    escaped = _MARKUP_LINE_RE.sub(_highlight_markup_line, escaped)
+    
+    # Highlight tags: opening tags and closing brackets
+    escaped = _TAG_RE.sub(_highlight_tag, escaped)
+    
+    # Highlight attribute values (single quotes are escaped to &#x27; above,
+    # so only double-quoted values can match)
+    escaped = _ATTR_DQ_RE.sub(
+        r'<span class="html-attr-name">\1</span>=<span class="html-attr-value">&quot;\2&quot;</span>',
+        escaped
+    )
     
-    return '\n'.join(highlighted_lines)
+    return escaped
 
-def convert_html_to_formatted(html_file, output_file, max_size_mb=10):
+def stream_highlight_html(html_content, f):
     """
-    Format HTML with syntax highlighting.
+    Write syntax-highlighted HTML to an open text file a chunk at a time.
     
-    Args:
-        html_file (str): Path to input HTML file
-        output_file (str): Path to output HTML file
-        max_size_mb (int): Maximum file size to display in MB (default: 10)
+    Highlighting is line-local, so the content is cut into chunks of about
+    _STREAM_CHUNK characters at line ends and each is highlighted on its own;
+    the output matches escape_and_highlight_html(html_content).
     
-    Returns:
-        bool: True if conversion successful, False otherwise
+    Args:
+        html_content (str): HTML content
+        f: Writable text file
     """
-    print(f"Attempting HTML formatting...")
-    print(f"Input: {html_file}")
-    print(f"Output: {output_file}")
-    print(f"Max Size: {max_size_mb} MB")
-    
-    try:
-        # Check file size
-        file_size = os.path.getsize(html_file)
-        print(f"HTML file size: {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)")
-        
-        # Read HTML file
-        print("Reading HTML file...")
-        with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
-            content = f.read()
-        
-        # Parse HTML to get statistics
-        print("Analyzing HTML...")
-        parser = HTMLElementCounter()
-        is_valid = True
-        error_msg = None
-        
-        try:
-            parser.feed(content)
-        except Exception as e:
-            print(f"HTML parsing warning: {e}")
-            is_valid = False
-            error_msg = str(e)
-        
-        # Check if file is too large for formatted display
-        truncated = False
-        if file_size > max_size_mb * 1024 * 1024:
-            truncated = True
-            print(f"WARNING: File is too large ({file_size / 1024 / 1024:.2f} MB), showing limited preview")
-            content = content[:100000]  # First 100KB only
-        
-        # Highlight HTML
-        highlighted_html = escape_and_highlight_html(content)
-        
-        output_parts = []
-        output_parts.append('''<style>
+    start, n = 0, len(html_content)
+    while start < n:
+        end = html_content.find('\n', start + _STREAM_CHUNK)
+        end = n if end < 0 else end + 1
+        f.write(escape_and_highlight_html(html_content[start:end]))
+        start = end
+
+# Styles written at the top of every preview page
+_PAGE_STYLE = '''<style>
         .html-stats {
             display: flex;
             gap: 20px;
@@ -248,41 +267,104 @@ def convert_html_to_formatted(html_file, output_file, max_size_mb=10):
             .html-bracket { color: #000000; }
             .html-comment { color: #666666; }
         }
-    </style>''')
+    </style>'''
+
+def open_output(path, gzip_output=False):
+    """Open the output page for writing as text, gzip-compressed (level 1) if asked."""
+    if gzip_output:
+        return gzip.open(path, 'wt', encoding='utf-8', compresslevel=1)
+    return open(path, 'w', encoding='utf-8', buffering=1 << 20)
+
+def convert_html_to_formatted(html_file, output_file, max_size_mb=10, highlight=True, gzip_output=False):
+    """
+    Format HTML with syntax highlighting.
+    
+    Args:
+        html_file (str): Path to input HTML file
+        output_file (str): Path to output HTML file
+        max_size_mb (int): Maximum file size to display in MB (default: 10)
+        highlight (bool): Syntax-highlight the source; if False it is shown as
+            plain escaped text (default: True)
+        gzip_output (bool): Write the output gzip-compressed (default: False)
+    
+    Returns:
+        bool: True if conversion successful, False otherwise
+    """
+    print(f"Attempting HTML formatting...")
+    print(f"Input: {html_file}")
+    print(f"Output: {output_file}")
+    print(f"Max Size: {max_size_mb} MB")
+    
+    try:
+        # Check file size
+        file_size = os.path.getsize(html_file)
+        print(f"HTML file size: {file_size:,} bytes ({file_size / 1024 / 1024:.2f} MB)")
+        
+        # Check if file is too large for formatted display; only the first
+        # 100KB is then read, and the statistics below describe that slice
+        truncated = False
+        read_chars = -1
+        if file_size > max_size_mb * 1024 * 1024:
+            truncated = True
+            print(f"WARNING: File is too large ({file_size / 1024 / 1024:.2f} MB), showing limited preview")
+            read_chars = 100000  # First 100KB only
+        
+        # Read HTML file
+        print("Reading HTML file...")
+        with open(html_file, 'r', encoding='utf-8', errors='replace') as f:
+            content = f.read(read_chars)
+        
+        # Parse HTML to get statistics
+        print("Analyzing HTML...")
+        parser = LxmlElementCounter() if HAS_LXML else HTMLElementCounter()
+        is_valid = True
+        error_msg = None
+        
+        try:
+            parser.feed(content)
+            parser.close()
+        except Exception as e:
+            print(f"HTML parsing warning: {e}")
+            is_valid = False
+            error_msg = str(e)
         
-        # Add stats with better styling
-        output_parts.append('        <div class="html-stats">\n')
-        output_parts.append(f'            <div class="html-stat-box"><div class="html-stat-label">File Size</div><div class="html-stat-value">{file_size / 1024:.1f} KB</div></div>\n')
-        output_parts.append(f'            <div class="html-stat-box"><div class="html-stat-label">Status</div><div class="html-stat-value" style="font-size: 18px;">{"✓ Valid" if is_valid else "⚠ Warning"}</div></div>\n')
-        output_parts.append(f'            <div class="html-stat-box"><div class="html-stat-label">Elements</div><div class="html-stat-value">{parser.element_count}</div></div>\n')
-        output_parts.append(f'            <div class="html-stat-box"><div class="html-stat-label">DOCTYPE</div><div class="html-stat-value" style="font-size: 18px;">{"✓ Yes" if parser.has_doctype else "No"}</div></div>\n')
+        # Write the page straight to the output file; the highlighted HTML is
+        # streamed in chunks rather than joined into one string first
+        with open_output(output_file, gzip_output) as f:
+            f.write(_PAGE_STYLE)
         
-        # Show top tags
-        if parser.tag_counts:
-            top_tags = sorted(parser.tag_counts.items(), key=lambda x: x[1], reverse=True)[:3]
-            top_tags_str = ', '.join([f'{tag} ({count})' for tag, count in top_tags])
-            output_parts.append(f'            <div class="html-stat-box"><div class="html-stat-label">Top Tags</div><div class="html-stat-value" style="font-size: 14px;">{html_module.escape(top_tags_str)}</div></div>\n')
+            # Add stats with better styling
+            f.write('        <div class="html-stats">\n')
+            f.write(f'            <div class="html-stat-box"><div class="html-stat-label">File Size</div><div class="html-stat-value">{file_size / 1024:.1f} KB</div></div>\n')
+            f.write(f'            <div class="html-stat-box"><div class="html-stat-label">Status</div><div class="html-stat-value" style="font-size: 18px;">{"✓ Valid" if is_valid else "⚠ Warning"}</div></div>\n')
+            f.write(f'            <div class="html-stat-box"><div class="html-stat-label">Elements{" (first 100KB)" if truncated else ""}</div><div class="html-stat-value">{parser.element_count}</div></div>\n')
+            f.write(f'            <div class="html-stat-box"><div class="html-stat-label">DOCTYPE</div><div class="html-stat-value" style="font-size: 18px;">{"✓ Yes" if parser.has_doctype else "No"}</div></div>\n')
         
-        output_parts.append('        </div>\n')
+            # Show top tags
+            if parser.tag_counts:
+                top_tags = sorted(parser.tag_counts.items(), key=lambda x: x[1], reverse=True)[:3]
+                top_tags_str = ', '.join([f'{tag} ({count})' for tag, count in top_tags])
+                f.write(f'            <div class="html-stat-box"><div class="html-stat-label">Top Tags</div><div class="html-stat-value" style="font-size: 14px;">{html_module.escape(top_tags_str)}</div></div>\n')
         
-        # Show error if invalid
-        if not is_valid and error_msg:
-            output_parts.append(f'        <div class="html-error-banner">⚠️ HTML Parsing Warning: {html_module.escape(error_msg)}</div>\n')
+            f.write('        </div>\n')
         
-        # Show warning if truncated
-        if truncated:
-            output_parts.append(f'        <div class="html-warning-banner">⚠️ This HTML file is large ({file_size / 1024 / 1024:.2f} MB). Showing first 100KB only. Download for full content.</div>\n')
+            # Show error if invalid
+            if not is_valid and error_msg:
+                f.write(f'        <div class="html-error-banner">⚠️ HTML Parsing Warning: {html_module.escape(error_msg)}</div>\n')
         
-        # Display HTML content
-        output_parts.append('        <div class="html-container">\n')
-        output_parts.append('            <pre>')
-        output_parts.append(highlighted_html)
-        output_parts.append('</pre>\n')
-        output_parts.append('        </div>\n')
+            # Show warning if truncated
+            if truncated:
+                f.write(f'        <div class="html-warning-banner">⚠️ This HTML file is large ({file_size / 1024 / 1024:.2f} MB). Showing first 100KB only. Download for full content.</div>\n')
         
-        # Write output file
-        with open(output_file, 'w', encoding='utf-8') as f:
-            f.write(''.join(output_parts))
+            # Display HTML content
+            f.write('        <div class="html-container">\n')
+            f.write('            <pre>')
+            if highlight:
+                stream_highlight_html(content, f)
+            else:
+                f.write(html_module.escape(content))
+            f.write('</pre>\n')
+            f.write('        </div>\n')
         
         output_size = os.path.getsize(output_file)
         print(f"Formatted HTML file created successfully: {output_size:,} bytes")
@@ -299,6 +381,10 @@ def main():
     parser.add_argument('output_file', help='Output formatted HTML file path')
     parser.add_argument('--max-size-mb', type=int, default=10,
                         help='Maximum file size for formatted display in MB (default: 10)')
+    parser.add_argument('--no-highlight', action='store_true',
+                        help='Show the source as plain escaped text, without syntax highlighting')
+    parser.add_argument('--gzip', action='store_true',
+                        help='Write the output file gzip-compressed (fast level 1)')
     
     args = parser.parse_args()
     
@@ -321,7 +407,9 @@ def main():
     success = convert_html_to_formatted(
         args.html_file,
         args.output_file,
-        max_size_mb=args.max_size_mb
+        max_size_mb=args.max_size_mb,
+        highlight=not args.no_highlight,
+        gzip_output=args.gzip
     )
     
     if success: